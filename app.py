@@ -1,106 +1,319 @@
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 
+import numpy as np
 import pygame as pg
 from pygame import Rect
 
 from items import Dynamic
-from items.actions import get_keyboard_action, get_random_action
-from items.factory import Provider
-from items.rules import MAIN_CHAR_COLLISION, MONSTER_COLLISION
-from util import Item
+from items.actions import get_keyboard_action
+from items.replay import ReplayRecorder
+from items.world import World
+from util.clock import Clock, RealClock, VirtualClock
+from util.profiler import FrameProfiler
 from view import CharacterView
+from view.renderer import Background, Renderer, interpolate_rect
 
 BLACK = (0, 0, 0)
 WHITE = (255, 255, 255)
 TEXT_PAD = 3
 
+# frames after which the profiling statistics are exported again
+PROFILE_EXPORT_FRAMES = 250
+
+# rate of the frames drawn
+FRAME_RATE = 25
+
+# frames not drawn in a row, at most, while the simulation is behind
+MAX_SKIPPED_FRAMES = 5
+
+# linear speed of the main character driven by the keyboard
+KEYBOARD_SPEED = 100
+
 
 class Game:
     def __init__(
         self,
         screen_size: Tuple[int, int],
         char_view_size: Tuple[int, int],
-        config: str
+        config: str,
+        headless: bool = False,
+        clock: Optional[Clock] = None,
+        vectorized: bool = False,
+        seed: Optional[int] = None,
+        profile: Optional[str] = None,
+        profile_overlay: bool = False,
+        record: Optional[str] = None,
+        sim_hz: int = 25,
+        max_substeps: int = 5,
+        interpolate: bool = True
     ) -> None:
         pg.init()
-        self.__screen = pg.display.set_mode(
-            (screen_size[0] + char_view_size[0], screen_size[1])
-        )
 
-        self.__provider = Provider(config)
+        # In headless mode no display is opened and the game is driven by a
+        # virtual clock, so the simulation runs as fast as possible.
+        self.__headless = headless
+
+        if headless:
+            self.__screen = None
+        else:
+            self.__screen = pg.display.set_mode(
+                (screen_size[0] + char_view_size[0], screen_size[1])
+            )
+
+        # a recorded session is replayed from its seed, so it needs one
+        if record is not None and seed is None:
+            seed = int(np.random.default_rng().integers(2 ** 31))
+
+        # without a display there is no keyboard: the main character then
+        # wanders like monsters do
+        self.__world = World(
+            config,
+            vectorized=vectorized,
+            seed=seed,
+            random_main_char=headless
+        )
+        self.__provider = self.__world.provider
 
         self.__screen_rect = Rect(0, 0, screen_size[0], screen_size[1])
-        self.__game_area = self.__provider.game_area
 
-        self.__clock = pg.time.Clock()
+        if clock is not None:
+            self.__clock = clock
+        elif headless:
+            self.__clock = VirtualClock()
+        else:
+            self.__clock = RealClock()
 
         self.__screen_size = screen_size
+        self.__panel_rect = Rect(screen_size[0], 0, char_view_size[0], screen_size[1])
 
         self.__main_char = self.__provider.main_character
-        self.__main_char.collision_rules = MAIN_CHAR_COLLISION
 
-        self.__char_view = CharacterView(char_view_size[0], char_view_size[1])
+        # The simulation runs at `sim_hz` steps per second of game time
+        # (rounded to whole milliseconds per step), independently of the
+        # frame rate; when drawn, items are interpolated between steps.
+        self.__step_millis = max(1, round(1000 / sim_hz))
+        self.__max_substeps = max_substeps
+        self.__interpolate = interpolate and not headless
+        self.__dynamics = [self.__main_char, *self.__world.monsters]
 
-        for monster in self.__get_monsters():
-            monster.collision_rules = MONSTER_COLLISION
+        self.__char_view = CharacterView(char_view_size[0], char_view_size[1])
 
         self.__grid = self.__provider.grid
 
-        self.__game_rect = self.__game_area.get_rect()
+        self.__game_rect = self.__world.area
+
+        # The screen and the character view are drawn by renderers of their
+        # own, sharing the background: the game area is never drawn as a
+        # whole.
+        if headless:
+            self.__renderer = None
+            self.__view_renderer = None
+        else:
+            background = Background(self.__provider)
+            self.__renderer = Renderer(self.__provider, screen_size, background)
+            self.__view_renderer = Renderer(self.__provider, self.__char_view.source_size, background)
+
+        # region of the game area shown on the last frame
+        self.__shown_rect: Optional[Rect] = None
+
+        # Frame phases are timed only when profiling: statistics are then
+        # exported to the `profile` file (JSON or CSV) and/or shown on the
+        # panel.
+        if profile is not None or profile_overlay:
+            self.__profiler = FrameProfiler()
+        else:
+            self.__profiler = None
+
+        self.__profile_path = profile
+        self.__profile_overlay = profile_overlay and not headless
+
+        if record is not None:
+            self.__recorder = ReplayRecorder(
+                record,
+                config,
+                seed,
+                vectorized=vectorized,
+                random_main_char=headless,
+                linear_speed=KEYBOARD_SPEED
+            )
+        else:
+            self.__recorder = None
+
+    @property
+    def world(self) -> World:
+        return self.__world
+
+    @property
+    def profiler(self) -> Optional[FrameProfiler]:
+        return self.__profiler
 
-        self.__consumed: Dict[str, Tuple[int, Item]] = {}
+    def run(self, duration_millis: Optional[int] = None):
+        # the recording is saved even when the session fails, as it's what
+        # reproduces the failure
+        try:
+            self.__loop(duration_millis)
+        finally:
+            if self.__recorder is not None:
+                self.__recorder.save()
 
-    def run(self):
+            pg.quit()
+
+    def __loop(self, duration_millis: Optional[int]):
         running = True
+        profiler = self.__profiler
+        step_millis = self.__step_millis
+
+        # Game time not simulated yet: the simulation advances by fixed
+        # steps, as many as fit in the time elapsed (up to `max_substeps`
+        # per frame), whatever the frame rate.
+        accumulator = 0
+        sim_timestamp = self.__clock.get_ticks()
+        skipped_frames = 0
+
+        # the duration counts from the start of the run, not of the clock
+        start_timestamp = sim_timestamp
+
+        # rects of the dynamic items before the last step, to interpolate
+        previous_rects: Optional[Dict[Dynamic, Rect]] = None
 
         while running:
-            for event in pg.event.get():
-                if event.type == pg.QUIT:
-                    running = False
+            if profiler is not None:
+                profiler.start_frame()
+                queries = self.__grid.query_count
+
+            if not self.__headless:
+                for event in pg.event.get():
+                    if event.type == pg.QUIT:
+                        running = False
+
+            if profiler is not None:
+                profiler.mark('input')
+
+            if duration_millis is not None and sim_timestamp - start_timestamp >= duration_millis:
+                break
+
+            accumulator += self.__clock.get_time()
+
+            if self.__headless:
+                main_char_action = None
+            else:
+                main_char_action = get_keyboard_action(linear_speed=KEYBOARD_SPEED, clock=self.__clock)
+
+            substeps = 0
+
+            # with no display all the time elapsed is simulated, however long
+            while accumulator >= step_millis \
+                    and (self.__headless or substeps < self.__max_substeps) \
+                    and (duration_millis is None or sim_timestamp - start_timestamp < duration_millis):
+                sim_timestamp += step_millis
+                accumulator -= step_millis
+                substeps += 1
+
+                # keyboard actions start at the time of the step they apply to
+                if main_char_action is not None:
+                    main_char_action = {**main_char_action, 'start_timestamp': sim_timestamp}
+
+                if self.__recorder is not None:
+                    self.__recorder.record(self.__world, step_millis, sim_timestamp, main_char_action)
+
+                if self.__interpolate:
+                    previous_rects = {d: d.rect for d in self.__dynamics}
 
-            # Calculating the time delta from last tick (in seconds)
-            dt = self.__clock.get_time() / 1000.0
+                self.__world.step(step_millis / 1000.0, sim_timestamp, main_char_action, profiler)
 
-            current_timestamp = pg.time.get_ticks()
+            if profiler is not None:
+                profiler.count('substeps', substeps)
 
-            self.set_main_char_action(dt, current_timestamp)
-            self.__set_monsters_actions(dt, current_timestamp)
+            # When the simulation is behind, frames are not drawn until it
+            # catches up: if it never does, the time missed is dropped, to
+            # slow the game down rather than not show it.
+            behind = accumulator >= step_millis \
+                and (duration_millis is None or sim_timestamp - start_timestamp < duration_millis)
 
-            self.__resolve_collisions(current_timestamp)
+            if behind and skipped_frames < MAX_SKIPPED_FRAMES:
+                skipped_frames += 1
+            elif not self.__headless and running:
+                if behind:
+                    accumulator %= step_millis
 
-            self.__regenerate_interactive(current_timestamp, duration=10000)
+                skipped_frames = 0
 
-            self.__update_sprites()
+                self.__render(previous_rects, accumulator / step_millis)
 
-            # Drawing part:
-            self.__game_area.fill(BLACK)
-            self.__screen.fill(BLACK)
+            if profiler is not None:
+                profiler.count('skipped_frames', int(skipped_frames > 0))
+                profiler.count('grid_queries', self.__grid.query_count - queries)
 
-            self.__draw_score()
+            # Limit the frame rate
+            self.__clock.tick(FRAME_RATE)
 
-            self.__draw_sprites()
+            if profiler is not None:
+                profiler.mark('wait')
+                profiler.end_frame()
 
-            self.__draw_screen()
+                if self.__profile_path is not None and profiler.frames % PROFILE_EXPORT_FRAMES == 0:
+                    profiler.export(self.__profile_path)
 
-            pg.display.flip()
+        if profiler is not None and self.__profile_path is not None and profiler.frames:
+            profiler.export(self.__profile_path)
 
-            # Limit the frame rate to 60 FPS
-            self.__clock.tick(25)
+    def __render(self, previous_rects: Optional[Dict[Dynamic, Rect]], alpha: float):
+        profiler = self.__profiler
 
-        pg.quit()
+        if previous_rects is not None:
+            main_char_rect = interpolate_rect(previous_rects[self.__main_char], self.__main_char.rect, alpha)
+        else:
+            main_char_rect = self.__main_char.rect
 
-    def __draw_screen(self):
-        self.__screen_rect.clamp_ip(self.__main_char.rect)
+        self.__screen_rect.clamp_ip(main_char_rect)
         self.__screen_rect.clamp_ip(self.__game_rect)
 
-        visible_surface = self.__game_area.subsurface(self.__screen_rect)
+        # only the regions shown on screen and in the character view are
+        # drawn, the latter centered on the source of the view
+        dirty = self.__renderer.draw(self.__screen_rect.topleft, previous_rects, alpha)
 
+        view_rect = Rect((0, 0), self.__char_view.source_size)
+        view_rect.center = self.__char_view.get_source_rect(self.__main_char, main_char_rect).center
+        view_dirty = self.__view_renderer.draw(view_rect.topleft, previous_rects, alpha)
+
+        if profiler is not None:
+            profiler.mark('render')
+            profiler.count('dirty_rects', len(dirty) + len(view_dirty))
+
+        self.__screen.fill(BLACK, self.__panel_rect)
+
+        self.__draw_score()
+
+        if profiler is not None:
+            profiler.mark('panel')
+
+        # the overlay is timed on its own, so that the profiler doesn't
+        # count itself in the other phases
+        if self.__profile_overlay:
+            profiler.draw(self.__screen, self.__panel_rect.x + TEXT_PAD, 80)
+            profiler.mark('overlay')
+
+        updates = self.__draw_screen(dirty, main_char_rect)
+
+        pg.display.update(updates)
+
+        if profiler is not None:
+            profiler.mark('display')
+
+    def __draw_screen(self, dirty: List[Rect], main_char_rect: Rect) -> List[Rect]:
+        # the view follows the main character where it's drawn, relative to
+        # the region its renderer draws
+        view_origin = self.__view_renderer.rect.topleft
         view = self.__char_view.get_view(
-            target_surface=self.__game_area,
-            character=self.__main_char
+            target_surface=self.__view_renderer.surface,
+            character=self.__main_char,
+            ch_rect=main_char_rect.move(-view_origin[0], -view_origin[1])
         )
         view.set_alpha(200)
 
+        if self.__profiler is not None:
+            self.__profiler.mark('view')
+
         self.__screen.blit(
             source=view,
             dest=(
@@ -108,9 +321,23 @@ class Game:
                 self.__screen_size[1] - view.get_rect().height
             )
         )
-        self.__screen.blit(source=visible_surface, dest=(0, 0))
 
-        pg.draw.line(
+        # The visible part of the game area is copied entirely only when it
+        # scrolled, otherwise just the regions which changed are.
+        surface = self.__renderer.surface
+
+        if self.__shown_rect != self.__screen_rect:
+            self.__screen.blit(source=surface, dest=(0, 0))
+            updates = [Rect(0, 0, self.__screen_size[0], self.__screen_size[1])]
+
+            self.__shown_rect = Rect(self.__screen_rect)
+        else:
+            for rect in dirty:
+                self.__screen.blit(source=surface, dest=rect, area=rect)
+
+            updates = dirty
+
+        line_rect = pg.draw.line(
             surface=self.__screen,
             color=WHITE,
             start_pos=(self.__screen_size[0], 0),
@@ -118,11 +345,7 @@ class Game:
             width=2
         )
 
-    def __draw_sprites(self):
-        self.__provider.interactive_sprites.draw(self.__game_area)
-        self.__provider.main_sprites.draw(self.__game_area)
-        self.__provider.dynamic_sprites.draw(self.__game_area)
-        self.__provider.static_sprites.draw(self.__game_area)
+        return updates + [line_rect, self.__panel_rect]
 
     def __draw_score(self):
         font = pg.font.Font(None, 36)
@@ -136,67 +359,80 @@ class Game:
         r = text_surface.get_rect()
 
         font = pg.font.Font(None, 36)
-        score = self.__main_char.item_status['score']
+        score = self.__main_char.item_status.score
         text_surface = font.render(f'{score}', True, WHITE)
         self.__screen.blit(
             source=text_surface,
             dest=(self.__screen_size[0] + TEXT_PAD, TEXT_PAD + r.height)
         )
 
-    def __update_sprites(self):
-        self.__provider.interactive_sprites.update()
-        self.__provider.main_sprites.update()
-        self.__provider.dynamic_sprites.update()
-        self.__provider.static_sprites.update()
-
-    def __resolve_collisions(self, current_timestamp: int):
-        def resolve_collision(d: Dynamic):
-            for i in d.act_collisions(self.__grid, current_timestamp):
-                if i.item_status['removed']:
-                    self.__grid.remove_item(i)
-                    i.kill()
-                    self.__consumed[i.id] = (current_timestamp, i)
-
-        from itertools import chain
-
-        for d in chain(self.__provider.main_sprites, self.__provider.dynamic_sprites):
-            resolve_collision(d)
-
-    def __regenerate_interactive(self, current_timestamp: int, duration: int):
-        for (id, (t, i)) in list(self.__consumed.items()):
-            if current_timestamp - t > duration:
-                del self.__consumed[id]
-                i.item_status['removed'] = False
-
-                self.__provider.interactive_sprites.add(i)
-                self.__grid.insert_item(i)
-
-    def __set_monsters_actions(self, dt, current_timestamp: int):
-        for monster in self.__get_monsters():
-            a = get_random_action(linear_speed=75)
-
-            monster.start_action(a, current_timestamp=current_timestamp)
-            monster.act(dt=dt, area=self.__game_rect, grid=self.__grid)
-
-    def __get_monsters(self):
-        dynamic_sprites: List[Dynamic] = self.__provider \
-            .dynamic_sprites \
-            .sprites()
-
-        return dynamic_sprites
-
-    def set_main_char_action(self, dt, current_timestamp: int):
-        a = get_keyboard_action(linear_speed=100)
-
-        self.__main_char.start_action(
-            a,
-            current_timestamp=current_timestamp
-        )
-        self.__main_char.act(dt=dt, area=self.__game_rect, grid=self.__grid)
-
 
-Game(
-    screen_size=(640, 480),
-    char_view_size=(150, 250),
-    config='config.yaml'
-).run()
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--headless',
+        action='store_true',
+        help='run without display, driven by a virtual clock'
+    )
+    parser.add_argument(
+        '--duration',
+        type=float,
+        default=None,
+        help='episode duration in seconds (game time)'
+    )
+    parser.add_argument(
+        '--vectorized',
+        action='store_true',
+        help='move all the dynamic items with the vectorized engine'
+    )
+    parser.add_argument(
+        '--seed',
+        type=int,
+        default=None,
+        help='seed of the random actions'
+    )
+    parser.add_argument(
+        '--profile',
+        default=None,
+        help='file the frame profiling statistics are exported to (.json or .csv)'
+    )
+    parser.add_argument(
+        '--profile-overlay',
+        action='store_true',
+        help='show the frame profiling statistics on the panel'
+    )
+    parser.add_argument(
+        '--record',
+        default=None,
+        help='file the session is recorded to, to be played back by items.replay'
+    )
+    parser.add_argument(
+        '--sim-hz',
+        type=int,
+        default=25,
+        help='simulation steps per second of game time'
+    )
+    parser.add_argument(
+        '--no-interpolation',
+        action='store_true',
+        help='draw items where the last simulation step left them'
+    )
+    args = parser.parse_args()
+
+    Game(
+        screen_size=(640, 480),
+        char_view_size=(150, 250),
+        config='config.yaml',
+        headless=args.headless,
+        vectorized=args.vectorized,
+        seed=args.seed,
+        profile=args.profile,
+        profile_overlay=args.profile_overlay,
+        record=args.record,
+        sim_hz=args.sim_hz,
+        interpolate=not args.no_interpolation
+    ).run(
+        duration_millis=None if args.duration is None else int(args.duration * 1000)
+    )
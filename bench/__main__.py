@@ -0,0 +1,278 @@
+import argparse
+import glob
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+# rendering is measured off screen, unless a driver is chosen explicitly
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import pygame as pg  # noqa: E402
+from pygame import Rect  # noqa: E402
+
+from app import Game  # noqa: E402
+from bench.maps import MapSpec, write_map  # noqa: E402
+from items.factory import Provider, clear_assets  # noqa: E402
+from items.maps import compile_map, load_map, parse_map  # noqa: E402
+from util.clock import VirtualClock  # noqa: E402
+
+BENCH_DIR = '.bench'
+
+# maps the benchmarks run on: None stands for the map of the game
+SCENARIOS: Dict[str, Optional[MapSpec]] = {
+    'config': None,
+    'medium': MapSpec(
+        grid_width=200,
+        grid_height=150,
+        wall_density=0.05,
+        monsters=500,
+        apples=500,
+        bad_apples=200
+    ),
+    'large': MapSpec(
+        grid_width=400,
+        grid_height=300,
+        wall_density=0.03,
+        monsters=2000,
+        apples=3000,
+        bad_apples=1000
+    )
+}
+
+Metrics = Dict[str, float]
+
+
+def get_map_file(name: str, seed: int) -> str:
+    spec = SCENARIOS[name]
+
+    if spec is None:
+        return 'config.yaml'
+
+    # the parameters are in the name, so that a changed spec makes a new map
+    params = '-'.join(str(v) for v in spec.values())
+
+    return write_map(spec, os.path.join(BENCH_DIR, 'maps', f'{name}-{params}-{seed}.yaml'), seed)
+
+
+def bench_startup(def_file: str) -> Metrics:
+    # compiled in an empty cache, then loaded back from it
+    with tempfile.TemporaryDirectory() as cache_dir:
+        t = time.perf_counter()
+        compile_map(def_file, cache_dir)
+        compile_s = time.perf_counter() - t
+
+        t = time.perf_counter()
+        load_map(compile_map(def_file, cache_dir))
+        load_cached_s = time.perf_counter() - t
+
+    clear_assets()
+
+    # the provider loads the map from the cache of the game
+    compile_map(def_file)
+
+    t = time.perf_counter()
+    provider = Provider(def_file)
+    startup_s = time.perf_counter() - t
+
+    entities = len(provider.static_sprites) + len(provider.interactive_sprites) \
+        + len(provider.dynamic_sprites) + len(provider.main_sprites)
+
+    return {
+        'entities': entities,
+        'compile_s': compile_s,
+        'load_cached_s': load_cached_s,
+        'startup_s': startup_s,
+        'entities_per_s': entities / startup_s
+    }
+
+
+def bench_grid(def_file: str, repeat: int) -> Metrics:
+    provider = Provider(def_file)
+    grid = provider.grid
+    cw, ch = grid.cell_size
+    area = Rect((0, 0), grid.area)
+
+    items = [*provider.interactive_sprites, *provider.dynamic_sprites, *provider.main_sprites]
+    dynamics = [*provider.dynamic_sprites, *provider.main_sprites]
+
+    def rate(f, n: int) -> float:
+        t = time.perf_counter()
+
+        for _ in range(repeat):
+            f()
+
+        return n * repeat / (time.perf_counter() - t)
+
+    def remove_insert():
+        for i in items:
+            grid.remove_item(i)
+
+        for i in items:
+            grid.insert_item(i)
+
+    def query():
+        for d in dynamics:
+            for _ in grid.iter_items_in_area(d.rect.inflate(2 * cw, 2 * ch).clip(area)):
+                pass
+
+    def move():
+        for d in dynamics:
+            rect = d.rect
+            moved = rect.move(cw, ch).clamp(area)
+
+            grid.move_item(d, rect, moved)
+            grid.move_item(d, moved, rect)
+
+    def is_blocked():
+        for d in dynamics:
+            grid.is_blocked(d.rect)
+
+    return {
+        'remove_insert_per_s': rate(remove_insert, 2 * len(items)),
+        'queries_per_s': rate(query, len(dynamics)),
+        'moves_per_s': rate(move, 2 * len(dynamics)),
+        'is_blocked_per_s': rate(is_blocked, len(dynamics))
+    }
+
+
+def bench_game(name: str, def_file: str, seconds: float, vectorized: bool, render: bool) -> Metrics:
+    # the main character and the monsters
+    dynamics = 1 + int((parse_map(def_file)['spawns']['kind'] == b'm').sum())
+
+    clear_assets()
+
+    game = Game(
+        screen_size=(640, 480),
+        char_view_size=(150, 250),
+        config=def_file,
+        headless=not render,
+        clock=VirtualClock(),
+        vectorized=vectorized,
+        seed=0,
+        profile=os.path.join(BENCH_DIR, f'profile-{name}.json')
+    )
+
+    t = time.perf_counter()
+    game.run(duration_millis=int(seconds * 1000))
+    elapsed = time.perf_counter() - t
+
+    ticks = game.profiler.frames
+    stats = game.profiler.stats()['timings']
+
+    metrics = {
+        'ticks_per_s': ticks / elapsed,
+        'entity_ticks_per_s': ticks * dynamics / elapsed
+    }
+
+    for phase, s in stats.items():
+        metrics[f'{phase}_ms'] = s['mean']
+
+    return metrics
+
+
+def run(names: List[str], seconds: float, repeat: int, seed: int) -> Dict[str, Dict[str, Metrics]]:
+    results: Dict[str, Dict[str, Metrics]] = {}
+
+    for name in names:
+        def_file = get_map_file(name, seed)
+
+        print(f'{name}: {def_file}', file=sys.stderr)
+
+        results[name] = {
+            'startup': bench_startup(def_file),
+            'grid': bench_grid(def_file, repeat),
+            'simulation': bench_game(f'{name}-simulation', def_file, seconds, vectorized=False, render=False),
+            'vectorized': bench_game(f'{name}-vectorized', def_file, seconds, vectorized=True, render=False),
+            'rendering': bench_game(f'{name}-rendering', def_file, seconds, vectorized=False, render=True)
+        }
+
+    return results
+
+
+def get_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True,
+            text=True,
+            check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def report(results: Dict[str, Dict[str, Metrics]], previous: Optional[dict]):
+    previous_results = previous['results'] if previous is not None else {}
+
+    for name, benches in results.items():
+        for bench, metrics in benches.items():
+            print(f'\n{name} / {bench}')
+
+            for metric, value in metrics.items():
+                line = f'  {metric:24} {value:14.4f}'
+                before = previous_results.get(name, {}).get(bench, {}).get(metric)
+
+                if before:
+                    line += f'   (x{value / before:.2f} of {before:.4f})'
+
+                print(line)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Runs the benchmarks, storing the results')
+    parser.add_argument(
+        '--scenario',
+        action='append',
+        choices=list(SCENARIOS),
+        help='map to run on (repeatable, all of them by default)'
+    )
+    parser.add_argument(
+        '--duration',
+        type=float,
+        default=20,
+        help='simulated seconds for the game benchmarks'
+    )
+    parser.add_argument('--repeat', type=int, default=5, help='repetitions of the grid benchmarks')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the synthetic maps')
+    parser.add_argument(
+        '--compare',
+        default=None,
+        help='results file to compare with (the latest stored by default)'
+    )
+    args = parser.parse_args()
+
+    results_dir = os.path.join(BENCH_DIR, 'results')
+    stored = sorted(glob.glob(os.path.join(results_dir, '*.json')))
+
+    previous = None
+    compare = args.compare or (stored[-1] if stored else None)
+
+    if compare is not None:
+        with open(compare, 'r') as f:
+            previous = json.load(f)
+
+    os.makedirs(results_dir, exist_ok=True)
+
+    pg.init()
+
+    results = run(args.scenario or list(SCENARIOS), args.duration, args.repeat, args.seed)
+
+    path = os.path.join(results_dir, time.strftime('%Y%m%d-%H%M%S') + '.json')
+
+    with open(path, 'w') as f:
+        json.dump({
+            'commit': get_commit(),
+            'python': platform.python_version(),
+            'machine': platform.platform(),
+            'duration': args.duration,
+            'results': results
+        }, f, indent=2)
+
+    report(results, previous)
+
+    print(f'\nresults stored in {path}' + (f', compared with {compare}' if compare else ''))
@@ -0,0 +1,57 @@
+import os
+from typing import TypedDict
+
+import numpy as np
+
+
+class MapSpec(TypedDict):
+    grid_width: int
+    grid_height: int
+    # fraction of the cells holding a wall
+    wall_density: float
+    monsters: int
+    apples: int
+    bad_apples: int
+
+
+def generate_map(spec: MapSpec, seed: int = 0, cell_size: int = 20) -> str:
+    """
+    Returns the definition of a random map (in the format read by
+    `Provider`), with the main character and the given number of monsters
+    and consumables placed on free cells.
+    """
+    rng = np.random.default_rng(seed)
+
+    width, height = spec['grid_width'], spec['grid_height']
+    cells = np.full((height, width), '-', dtype='U1')
+
+    cells[rng.random((height, width)) < spec['wall_density']] = 'W'
+
+    free = np.flatnonzero(cells.ravel() == '-')
+    spawns = 1 + spec['monsters'] + spec['apples'] + spec['bad_apples']
+
+    if spawns > len(free):
+        raise ValueError(f'{spawns} spawns do not fit in {len(free)} free cells')
+
+    picked = rng.choice(free, size=spawns, replace=False)
+    kinds = ['c'] + ['m'] * spec['monsters'] + ['a'] * spec['apples'] + ['b'] * spec['bad_apples']
+
+    cells.ravel()[picked] = kinds
+
+    rows = '\n'.join('    ' + ''.join(row) for row in cells)
+
+    return f'cell_width: {cell_size}\ncell_height: {cell_size}\nmap: |\n{rows}\n'
+
+
+def write_map(spec: MapSpec, path: str, seed: int = 0) -> str:
+    """
+    Writes the random map to the given path, unless already there. Returns
+    the path.
+    """
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+        with open(path, 'w') as f:
+            f.write(generate_map(spec, seed))
+
+    return path
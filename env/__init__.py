@@ -0,0 +1,111 @@
+from typing import Optional, Tuple
+
+import numpy as np
+
+from items.actions import get_keyboard_catalog
+from items.world import World, WorldSnapshot
+from view.observation import CHANNELS, GridObserver
+
+
+class WorldEnv:
+    """
+    A world stepped on behalf of an agent controlling the main character.
+
+    Actions are indexes in the keyboard catalog, observations are the grid
+    observations of the main character, with shape (channels, height,
+    width), and rewards are the changes of its score. An episode lasts
+    `episode_millis` of game time, advanced by `step_millis` at each step.
+    """
+
+    def __init__(
+        self,
+        config: str,
+        view_size: Tuple[int, int] = (9, 9),
+        step_millis: int = 40,
+        episode_millis: int = 60000,
+        vectorized: bool = False,
+        seed: Optional[int] = None
+    ) -> None:
+        self.__config = config
+        self.__view_size = view_size
+        self.__step_millis = step_millis
+        self.__episode_millis = episode_millis
+        self.__vectorized = vectorized
+
+        # seeds of the episodes not given one
+        self.__rng = np.random.default_rng(seed)
+
+        # the agent chooses from the same actions as the keyboard
+        self.__catalog = get_keyboard_catalog()
+
+        # the world is built on the first reset, and later ones restore its
+        # initial state
+        self.__world: Optional[World] = None
+        self.__observer: Optional[GridObserver] = None
+        self.__initial: Optional[WorldSnapshot] = None
+        self.__timestamp = 0
+        self.__score = 0
+
+    def reset(self, seed: Optional[int] = None) -> np.ndarray:
+        if seed is None:
+            seed = int(self.__rng.integers(2 ** 31))
+
+        if self.__world is None:
+            self.__world = World(self.__config, vectorized=self.__vectorized, seed=seed)
+            self.__observer = GridObserver(self.__world.grid, *self.__view_size)
+            self.__initial = self.__world.snapshot()
+        else:
+            self.__world.restore(self.__initial)
+            self.__world.seed(seed)
+
+        self.__timestamp = 0
+        self.__score = 0
+
+        return self.observe()
+
+    def step(self, action: int) -> Tuple[np.ndarray, float, bool]:
+        """
+        Returns the observation, the reward and whether the episode ended.
+        """
+        self.__world.step(
+            self.__step_millis / 1000,
+            self.__timestamp,
+            main_char_action={**self.__catalog[action], 'start_timestamp': self.__timestamp}
+        )
+
+        self.__timestamp += self.__step_millis
+
+        score = self.__world.main_character.item_status.score
+        reward = score - self.__score
+        self.__score = score
+
+        return self.observe(), float(reward), self.__timestamp >= self.__episode_millis
+
+    def snapshot(self) -> Tuple[WorldSnapshot, int, int]:
+        """
+        The state of the episode, to get back to with `restore`.
+        """
+        return self.__world.snapshot(), self.__timestamp, self.__score
+
+    def restore(self, snapshot: Tuple[WorldSnapshot, int, int]):
+        world_snapshot, self.__timestamp, self.__score = snapshot
+        self.__world.restore(world_snapshot)
+
+    def observe(self) -> np.ndarray:
+        return self.__observer.observe([self.__world.main_character])[0]
+
+    @property
+    def world(self) -> Optional[World]:
+        return self.__world
+
+    @property
+    def actions_number(self) -> int:
+        return len(self.__catalog)
+
+    @property
+    def observation_shape(self) -> Tuple[int, int, int]:
+        return CHANNELS, self.__view_size[1], self.__view_size[0]
+
+    @property
+    def timestamp(self) -> int:
+        return self.__timestamp
@@ -0,0 +1,294 @@
+import multiprocessing as mp
+import traceback
+from multiprocessing.connection import Connection
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from env import WorldEnv
+
+# state of the main character of each world: center and orientation
+STATE_COLUMNS = ('x', 'y', 'alpha')
+
+# buffers shared with the workers: name -> (shape after the slot and world
+# dimensions, dtype)
+BufferSpecs = Dict[str, Tuple[Tuple[int, ...], str]]
+
+
+def get_buffer_specs(observation_shape: Tuple[int, ...]) -> BufferSpecs:
+    return {
+        'actions': ((), 'int64'),
+        'observations': (observation_shape, 'float32'),
+        'rewards': ((), 'float32'),
+        'dones': ((), 'bool'),
+        'scores': ((), 'int64'),
+        'states': ((len(STATE_COLUMNS),), 'float64')
+    }
+
+
+def attach_buffers(
+        shared: Dict[str, SharedMemory],
+        specs: BufferSpecs,
+        slots: int,
+        worlds: int
+) -> Dict[str, np.ndarray]:
+    return {
+        name: np.ndarray((slots, worlds, *shape), dtype=dtype, buffer=shared[name].buf)
+        for name, (shape, dtype) in specs.items()
+    }
+
+
+def run_worker(
+        index: int,
+        conn: Connection,
+        shared: Dict[str, SharedMemory],
+        slots: int,
+        worlds: int,
+        env_args: dict
+):
+    """
+    Loop of a worker process, stepping the world `index`: results are
+    written in the slot of the step in the shared buffers, only the step
+    index is sent back.
+    """
+    buffers: Dict[str, np.ndarray] = {}
+
+    def write(slot: int, observation: np.ndarray, reward: float, done: bool):
+        main_char = env.world.main_character
+        rect = main_char.rect
+
+        buffers['observations'][slot, index] = observation
+        buffers['rewards'][slot, index] = reward
+        buffers['dones'][slot, index] = done
+        buffers['scores'][slot, index] = main_char.item_status.score
+        buffers['states'][slot, index] = rect.centerx, rect.centery, main_char.orientation_rad
+
+    # a failure before the first command is reported as the reply to it
+    step = -1
+
+    try:
+        env = WorldEnv(**env_args)
+        buffers = attach_buffers(shared, get_buffer_specs(env.observation_shape), slots, worlds)
+
+        while True:
+            command, step, arg = conn.recv()
+            slot = step % slots
+
+            if command == 'reset':
+                write(slot, env.reset(arg), 0, False)
+
+            elif command == 'step':
+                observation, reward, done = env.step(int(buffers['actions'][slot, index]))
+
+                # ended episodes start again at once
+                if done:
+                    observation = env.reset()
+
+                write(slot, observation, reward, done)
+
+            else:
+                break
+
+            conn.send((step, None))
+
+    except (EOFError, BrokenPipeError, ConnectionResetError):
+        # the parent is gone: nobody to report to
+        pass
+
+    except Exception:
+        try:
+            conn.send((step, traceback.format_exc()))
+        except (BrokenPipeError, OSError):
+            pass
+
+    finally:
+        # the arrays must go before the memory they are views of
+        buffers.clear()
+
+        for memory in shared.values():
+            memory.close()
+
+
+class VectorEnv:
+    """
+    Many worlds, each in its own process, stepped in lockstep.
+
+    Actions, observations, rewards, done flags and the state of the main
+    characters are exchanged through shared memory buffers, so that only
+    step indexes go through the pipes. The buffers are rings of `slots`
+    steps: the arrays returned are views of them, with no copy, valid until
+    `slots` more calls are done.
+
+    Worlds whose episode ended are reset at once: the observation returned
+    for them is the first one of the new episode.
+    """
+
+    def __init__(
+        self,
+        config: str,
+        worlds: int,
+        view_size: Tuple[int, int] = (9, 9),
+        step_millis: int = 40,
+        episode_millis: int = 60000,
+        vectorized: bool = False,
+        seed: Optional[int] = None,
+        slots: int = 2
+    ) -> None:
+        self.__worlds = worlds
+        self.__slots = slots
+        self.__step = 0
+        self.__slot = 0
+
+        probe = WorldEnv(config, view_size=view_size)
+        self.__actions_number = probe.actions_number
+
+        specs = get_buffer_specs(probe.observation_shape)
+
+        self.__shared: Dict[str, SharedMemory] = {}
+
+        for name, (shape, dtype) in specs.items():
+            size = slots * worlds * int(np.prod(shape, dtype=np.int64)) * np.dtype(dtype).itemsize
+            self.__shared[name] = SharedMemory(create=True, size=max(size, 1))
+
+        self.__buffers = attach_buffers(self.__shared, specs, slots, worlds)
+
+        self.__conns: List[Connection] = []
+        self.__processes: List[mp.Process] = []
+
+        for index in range(worlds):
+            conn, worker_conn = mp.Pipe()
+
+            process = mp.Process(
+                target=run_worker,
+                args=(
+                    index,
+                    worker_conn,
+                    self.__shared,
+                    slots,
+                    worlds,
+                    dict(
+                        config=config,
+                        view_size=view_size,
+                        step_millis=step_millis,
+                        episode_millis=episode_millis,
+                        vectorized=vectorized,
+                        seed=None if seed is None else seed + index
+                    )
+                ),
+                daemon=True
+            )
+            process.start()
+
+            # only the worker keeps its end open, so that its exit is seen as
+            # the end of the pipe
+            worker_conn.close()
+
+            self.__conns.append(conn)
+            self.__processes.append(process)
+
+    def __get_exit(self, index: int) -> str:
+        process = self.__processes[index]
+        process.join(timeout=1)
+
+        return f'worker exited with code {process.exitcode}'
+
+    def __run(self, command: str, args: Optional[Sequence] = None) -> int:
+        step = self.__step
+        self.__step += 1
+
+        for index, conn in enumerate(self.__conns):
+            try:
+                conn.send((command, step, None if args is None else args[index]))
+            except (BrokenPipeError, OSError):
+                raise RuntimeError(f'world {index} failed:\n{self.__get_exit(index)}')
+
+        for index, conn in enumerate(self.__conns):
+            try:
+                _, error = conn.recv()
+            except (EOFError, OSError):
+                error = self.__get_exit(index)
+
+            if error is not None:
+                raise RuntimeError(f'world {index} failed:\n{error}')
+
+        self.__slot = step % self.__slots
+
+        return self.__slot
+
+    def reset(self, seed: Optional[int] = None) -> np.ndarray:
+        """
+        Resets all the worlds (the world i with seed `seed + i`, if given),
+        returning their observations.
+        """
+        seeds = None if seed is None else [seed + index for index in range(self.__worlds)]
+
+        return self.__buffers['observations'][self.__run('reset', seeds)]
+
+    def step(self, actions: Sequence[int]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Steps all the worlds, each with its action. Returns the stacked
+        observations, rewards and done flags.
+        """
+        self.__buffers['actions'][self.__step % self.__slots] = actions
+
+        slot = self.__run('step')
+
+        return (
+            self.__buffers['observations'][slot],
+            self.__buffers['rewards'][slot],
+            self.__buffers['dones'][slot]
+        )
+
+    def close(self):
+        for conn in self.__conns:
+            try:
+                conn.send(('close', self.__step, None))
+            except (BrokenPipeError, OSError):
+                pass
+
+        for process in self.__processes:
+            process.join(timeout=5)
+
+            if process.is_alive():
+                process.terminate()
+
+        self.__conns.clear()
+        self.__processes.clear()
+
+        self.__buffers.clear()
+
+        for memory in self.__shared.values():
+            memory.close()
+            memory.unlink()
+
+        self.__shared.clear()
+
+    def __enter__(self) -> 'VectorEnv':
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @property
+    def worlds(self) -> int:
+        return self.__worlds
+
+    @property
+    def actions_number(self) -> int:
+        return self.__actions_number
+
+    @property
+    def scores(self) -> np.ndarray:
+        """
+        Scores of the main characters after the last call.
+        """
+        return self.__buffers['scores'][self.__slot]
+
+    @property
+    def states(self) -> np.ndarray:
+        """
+        Center and orientation (see `STATE_COLUMNS`) of the main characters
+        after the last call.
+        """
+        return self.__buffers['states'][self.__slot]
@@ -1,10 +1,9 @@
 import math
-from typing import Callable, Dict, List, Tuple, TypedDict
+from typing import Any, Callable, List, Optional, Tuple, TypedDict
 
-import pygame as pg
 from pygame import Rect, Surface
 
-from util import Grid, Item, ItemStatus, ItemType
+from util import Grid, Item, ItemStatus, ItemType, load_image
 
 from .actions import Action, ActionParams, ActionType, Orientation
 
@@ -16,7 +15,7 @@ class Frames(TypedDict):
 
 def extract_frames(file: str, frame_size: Tuple[int, int]) -> Frames:
     # Load image containing frames
-    sprite_sheet = pg.image.load(file).convert_alpha()
+    sprite_sheet = load_image(file)
 
     # Define the dimension of each frame
     frame_width = frame_size[0]
@@ -43,10 +42,31 @@ def extract_frames(file: str, frame_size: Tuple[int, int]) -> Frames:
     return Frames(standing_images=standing_images, moving_images=moving_images)
 
 
+# rect, orientation, image index, action, score and the fractions of pixel
+# moved beyond the rect
+DynamicState = Tuple[Rect, float, int, Action, int, Tuple[float, float]]
+
+
 class Dynamic(Item):
+    __slots__ = (
+        '__id',
+        '__item_type',
+        '__frames',
+        '__orientation',
+        '__alpha',
+        '__current_action',
+        '__engine',
+        '__engine_idx',
+        '__image_idx',
+        '__rect',
+        '__remainder',
+        '__item_status',
+        'action_listener'
+    )
+
     def __init__(
         self,
-        id: str,
+        id: int,
         item_type: ItemType,
         x: int,
         y: int,
@@ -56,7 +76,6 @@ class Dynamic(Item):
 
         self.__id = id
         self.__item_type = item_type
-        self.images: List[List[Surface]] = []
 
         self.__frames = frames
         self.__orientation = Orientation.down
@@ -66,15 +85,24 @@ class Dynamic(Item):
             params=ActionParams(rotation=self.__alpha)
         )
 
+        # engine holding the kinematic state, when bound to one
+        self.__engine: Optional[Any] = None
+        self.__engine_idx = -1
+
         self.__image_idx = 0
         self.__rect = self.image.get_rect()
         self.__rect.x = x - self.__rect.width / 2
         self.__rect.y = y - self.__rect.height / 2
 
-        self.__item_status: ItemStatus = {'score': 0, 'removed': False}
-        self.collision_rules: Dict[
-            ItemType, Callable[[Item, Item, int], bool]
-        ] = {}
+        # Moves are made of whole pixels: the fractions left are carried
+        # over to the next ones, so that the speed does not depend on the
+        # length of the steps.
+        self.__remainder = (0.0, 0.0)
+
+        self.__item_status = ItemStatus()
+
+        # called each time a new action is started
+        self.action_listener: Optional[Callable[[Dynamic], None]] = None
 
     def __stand(self):
         self.__image_idx = 0
@@ -90,36 +118,16 @@ class Dynamic(Item):
 
         self.__orientation = Orientation.get_orientation(self.__alpha)
 
-    def __move(self, dx: float, dy: float, frame_step: int):
+    def __move(self, dx: int, dy: int, frame_step: int):
         # It's assumed that the frame number is the same for each orientation
         frames_number = len(self.__frames['moving_images'][0])
         self.__image_idx = (self.__image_idx + frame_step) % frames_number
 
         self.__rect = self.__rect.move(dx, dy)
 
-    def __can_move(
-            self,
-            dx: float,
-            dy: float,
-            area: Rect,
-            grid: Grid
-    ) -> bool:
-        try_rect = self.__rect.move(dx, dy)
-
-        if not area.contains(try_rect):
-            return False
-
-        for item in grid.items_in_area(try_rect):
-            if item.id == self.__id or item.item_type is not ItemType.wall:
-                continue
-
-            if try_rect.colliderect(item.rect):
-                return False
-
-        return True
-
     def act(self, dt: float, area: Rect, grid: Grid):
-        if self.__current_action is None:
+        # when bound, the engine moves the item
+        if self.__current_action is None or self.__engine is not None:
             return
 
         action_type = self.__current_action['action_type']
@@ -136,13 +144,26 @@ class Dynamic(Item):
         elif action_type is ActionType.move or action_type is ActionType.hunt:
             l_speed = action_params['linear_speed']
             ds = dt * l_speed
-            dx = ds * math.cos(self.__alpha)
-            dy = - ds * math.sin(self.__alpha)
 
-            if self.__can_move(dx, dy, area, grid):
-                grid.remove_item(self)
-                self.__move(dx=dx, dy=dy, frame_step=1 if l_speed > 0 else -1)
-                grid.insert_item(self)
+            fx = self.__remainder[0] + ds * math.cos(self.__alpha)
+            fy = self.__remainder[1] - ds * math.sin(self.__alpha)
+
+            # as Rect.move, offsets are truncated
+            dx = int(fx)
+            dy = int(fy)
+
+            # The whole path is swept, so that walls are not skipped by long
+            # moves: the item stops against the first wall hit, then slides
+            # along it. Only when it can't move at all it stands.
+            ox, oy = grid.slide(self.__rect, dx, dy, area)
+
+            # against a wall, nothing is carried over
+            self.__remainder = (fx - dx if ox == dx else 0.0, fy - dy if oy == dy else 0.0)
+
+            if ox != 0 or oy != 0 or (dx == 0 and dy == 0):
+                old_rect = self.__rect
+                self.__move(dx=ox, dy=oy, frame_step=1 if l_speed > 0 else -1)
+                grid.move_item(self, old_rect, self.__rect)
 
             else:
                 self.__current_action = Action(
@@ -150,60 +171,154 @@ class Dynamic(Item):
                     params={}
                 )
 
-    def __match_rule(self, item: Item, current_timestamp: int) -> bool:
-        if self.id == item.id or not self.__rect.colliderect(item.rect):
-            return False
+                if self.action_listener is not None:
+                    self.action_listener(self)
+
+    def set_orientation(self, alpha: float):
+        """
+        Turns the item to the given angle (in radians, in [0, 2 pi)).
+        """
+        if self.__engine is not None:
+            self.__engine.set_orientation(self.__engine_idx, alpha)
+        else:
+            self.__alpha = alpha
+            self.__orientation = Orientation.get_orientation(alpha)
+
+    def bind(self, engine: Any, index: int):
+        """
+        Hands the kinematic state (position, orientation, animation) over to
+        the engine, at the given index: from now on it's read from there.
+        """
+        self.__engine = engine
+        self.__engine_idx = index
+
+    def unbind(self, rect: Rect, alpha: float, image_idx: int, remainder: Tuple[float, float]):
+        """
+        Takes back the kinematic state from the engine.
+        """
+        self.__engine = None
+        self.__engine_idx = -1
+
+        self.__rect = Rect(rect)
+        self.__remainder = remainder
+        self.__alpha = alpha
+        self.__orientation = Orientation.get_orientation(alpha)
+        self.__image_idx = image_idx
+
+    def get_state(self) -> DynamicState:
+        """
+        The state changing along the simulation. Rects and actions are
+        replaced, never changed, so they are not copied.
+        """
+        return (
+            self.rect,
+            self.orientation_rad,
+            self.image_idx,
+            self.__current_action,
+            self.__item_status.score,
+            self.remainder
+        )
+
+    def set_state(self, state: DynamicState, grid: Grid):
+        """
+        Gets back to a state given by `get_state`, without notifying the
+        action listener. When bound, the kinematic state is left to the
+        engine.
+        """
+        rect, alpha, image_idx, action, score, remainder = state
+
+        if self.__engine is None:
+            if rect != self.__rect:
+                grid.move_item(self, self.__rect, rect)
+                self.__rect = rect
 
-        if item.item_type in self.collision_rules:
-            return self.collision_rules[item.item_type](self, item, current_timestamp)
+            self.__remainder = remainder
 
-        return False
+            if alpha != self.__alpha:
+                self.__alpha = alpha
+                self.__orientation = Orientation.get_orientation(alpha)
 
-    def act_collisions(self, grid: Grid, current_timestamp: int) -> List[Item]:
-        items = grid.items_in_area(self.__rect)
+            self.__image_idx = image_idx
 
-        return [item for item in items if self.__match_rule(item, current_timestamp)]
+        self.__current_action = action
+        self.__item_status.score = score
+
+    @property
+    def frames(self) -> Frames:
+        return self.__frames
+
+    @property
+    def image_idx(self) -> int:
+        if self.__engine is not None:
+            return self.__engine.get_frame(self.__engine_idx)[1]
+
+        return self.__image_idx
 
     @property
     def action(self) -> Action:
         return self.__current_action
 
-    def start_action(self, a: Action, current_timestamp: int, force: bool = False) -> bool:
+    def action_expired(self, current_timestamp: int) -> bool:
         if 'start_timestamp' in self.__current_action \
                 and 'start_timestamp' in self.__current_action:
             current_a_start = self.__current_action['start_timestamp']
             current_a_duration = self.__current_action['duration_millis'] or 0
 
-            can_replace = current_timestamp - current_a_start >= current_a_duration or force
+            return current_timestamp - current_a_start >= current_a_duration
         else:
-            can_replace = True
+            return True
+
+    def start_action(self, a: Action, current_timestamp: int, force: bool = False) -> bool:
+        can_replace = force or self.action_expired(current_timestamp)
 
         if can_replace:
             self.__current_action = a.copy()
 
+            if self.__engine is not None:
+                self.__engine.set_action(self.__engine_idx, self.__current_action)
+
+            if self.action_listener is not None:
+                self.action_listener(self)
+
     @property
     def rect(self) -> Rect:
-        return Rect(
-            self.__rect.left,
-            self.__rect.top,
-            self.__rect.width,
-            self.__rect.height
-        )
+        if self.__engine is not None:
+            return self.__engine.get_rect(self.__engine_idx)
+
+        return self.__rect
+
+    @property
+    def remainder(self) -> Tuple[float, float]:
+        """
+        Fractions of pixel moved beyond the rect, along x and y.
+        """
+        if self.__engine is not None:
+            return self.__engine.get_remainder(self.__engine_idx)
+
+        return self.__remainder
 
     @property
     def orientation_rad(self) -> float:
+        if self.__engine is not None:
+            return self.__engine.get_alpha(self.__engine_idx)
+
         return self.__alpha
 
     @property
     def image(self) -> Surface:
+        if self.__engine is not None:
+            orientation, image_idx = self.__engine.get_frame(self.__engine_idx)
+        else:
+            orientation, image_idx = self.__orientation.value, self.__image_idx
+
         if self.__current_action['action_type'] is ActionType.move \
                 or self.__current_action['action_type'] is ActionType.hunt:
-            return self.__frames['moving_images'][self.__orientation.value][self.__image_idx]
+            return self.__frames['moving_images'][orientation][image_idx]
         else:
-            return self.__frames['standing_images'][self.__orientation.value]
+            return self.__frames['standing_images'][orientation]
 
     @property
-    def id(self) -> str:
+    def id(self) -> int:
         return self.__id
 
     @property
@@ -220,9 +335,11 @@ class Dynamic(Item):
 
 
 class Static(Item):
+    __slots__ = ('__id', '__item_type', '__image', '__rect', '__item_status')
+
     def __init__(
         self,
-        id: str,
+        id: int,
         item_type: ItemType,
         x: int,
         y: int,
@@ -233,30 +350,24 @@ class Static(Item):
 
         self.__id = id
         self.__item_type = item_type
-        self.images: List[List[Surface]] = []
 
         self.__image = image
         self.__rect = self.image.get_rect()
         self.__rect.x = x - self.__rect.width / 2
         self.__rect.y = y - self.__rect.height / 2
 
-        self.__item_status: ItemStatus = {'value': value, 'removed': False}
+        self.__item_status = ItemStatus(value=value)
 
     @property
     def rect(self) -> Rect:
-        return Rect(
-            self.__rect.left,
-            self.__rect.top,
-            self.__rect.width,
-            self.__rect.height
-        )
+        return self.__rect
 
     @property
     def image(self) -> Surface:
         return self.__image
 
     @property
-    def id(self) -> str:
+    def id(self) -> int:
         return self.__id
 
     @property
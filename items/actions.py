@@ -1,10 +1,12 @@
 import math
-import random
 from enum import Enum
-from typing import Optional, TypedDict
+from typing import List, Optional, Sequence, TypedDict
 
+import numpy as np
 import pygame as pg
 
+from util.clock import Clock, real_clock
+
 
 class Orientation(Enum):
     up = 0
@@ -56,9 +58,101 @@ class Action(TypedDict, total=False):
     params: ActionParams
 
 
-def get_keyboard_action(linear_speed: float = 20, angular_speed: float = math.pi) -> Action:
+# packed actions: keys present (see ACTION_KEYS) and values, with -1 for a
+# None duration
+ACTION_DTYPE = np.dtype([
+    ('action_type', 'i1'),
+    ('keys', 'u1'),
+    ('start_timestamp', '<i8'),
+    ('duration_millis', '<i8'),
+    ('angular_speed', '<f8'),
+    ('linear_speed', '<f8'),
+    ('rotation', '<f8')
+])
+
+ACTION_KEYS = ('start_timestamp', 'duration_millis')
+PARAMS_KEYS = ('angular_speed', 'linear_speed', 'rotation')
+
+
+def pack_actions(actions: Sequence[Action]) -> np.ndarray:
+    packed = np.zeros(len(actions), dtype=ACTION_DTYPE)
+
+    for k, action in enumerate(actions):
+        row = packed[k]
+        params = action['params']
+        keys = 0
+
+        row['action_type'] = action['action_type'].value
+
+        for bit, key in enumerate(ACTION_KEYS):
+            if key in action:
+                keys |= 1 << bit
+                row[key] = -1 if action[key] is None else action[key]
+
+        for bit, key in enumerate(PARAMS_KEYS, start=len(ACTION_KEYS)):
+            if key in params:
+                keys |= 1 << bit
+                row[key] = params[key]
+
+        row['keys'] = keys
+
+    return packed
+
+
+def unpack_action(row: np.void) -> Action:
+    keys = int(row['keys'])
+
+    action = Action(action_type=ActionType(int(row['action_type'])), params={})
+
+    for bit, key in enumerate(ACTION_KEYS):
+        if keys & (1 << bit):
+            value = int(row[key])
+            action[key] = None if value == -1 and key == 'duration_millis' else value
+
+    for bit, key in enumerate(PARAMS_KEYS, start=len(ACTION_KEYS)):
+        if keys & (1 << bit):
+            action['params'][key] = float(row[key])
+
+    return action
+
+
+def get_keyboard_catalog(linear_speed: float = 100, angular_speed: float = math.pi) -> List[Action]:
+    """
+    Actions `get_keyboard_action` chooses from, with no start timestamp.
+    """
+    return [
+        Action(duration_millis=None, action_type=ActionType.stand, params={}),
+        Action(duration_millis=None, action_type=ActionType.pick, params={}),
+        Action(
+            duration_millis=None,
+            action_type=ActionType.move,
+            params=ActionParams(linear_speed=linear_speed)
+        ),
+        Action(
+            duration_millis=None,
+            action_type=ActionType.move,
+            params=ActionParams(linear_speed=-linear_speed)
+        ),
+        Action(
+            duration_millis=None,
+            action_type=ActionType.rotate,
+            params=ActionParams(angular_speed=angular_speed)
+        ),
+        Action(
+            duration_millis=None,
+            action_type=ActionType.rotate,
+            params=ActionParams(angular_speed=-angular_speed)
+        )
+    ]
+
+
+def get_keyboard_action(
+        linear_speed: float = 20,
+        angular_speed: float = math.pi,
+        clock: Clock = real_clock
+) -> Action:
     keys = pg.key.get_pressed()
-    current_timestamp = pg.time.get_ticks()
+    current_timestamp = clock.get_ticks()
 
     def get_rotation_action() -> Optional[Action]:
         if keys[pg.K_LEFT]:
@@ -116,52 +210,45 @@ def get_keyboard_action(linear_speed: float = 20, angular_speed: float = math.pi
         or get_static_action()
 
 
-def get_random_action(linear_speed: float = 20, angular_speed: float = math.pi) -> Action:
-    current_timestamp = pg.time.get_ticks()
-
-    catalog = {
-        1: Action(
-            start_timestamp=current_timestamp,
+def get_random_catalog(linear_speed: float = 20, angular_speed: float = math.pi) -> List[Action]:
+    """
+    Actions picked (with the same probability) by the random policies,
+    with no start timestamp.
+    """
+    return [
+        Action(
             duration_millis=250,
             action_type=ActionType.rotate,
             params=ActionParams(angular_speed=angular_speed)
         ),
-        2: Action(
-            start_timestamp=current_timestamp,
+        Action(
             duration_millis=250,
             action_type=ActionType.rotate,
             params=ActionParams(angular_speed=-angular_speed)
         ),
-        3:  Action(
-            start_timestamp=current_timestamp,
+        Action(
             duration_millis=1000,
             action_type=ActionType.hunt,
             params=ActionParams(linear_speed=linear_speed)
         ),
-        4:  Action(
-            start_timestamp=current_timestamp,
+        Action(
             duration_millis=1000,
             action_type=ActionType.hunt,
             params=ActionParams(linear_speed=linear_speed)
         ),
-        5: Action(
-            start_timestamp=current_timestamp,
+        Action(
             duration_millis=1000,
             action_type=ActionType.move,
             params=ActionParams(linear_speed=-linear_speed)
         ),
-        6: Action(
-            start_timestamp=current_timestamp,
+        Action(
             duration_millis=1000,
             action_type=ActionType.move,
             params=ActionParams(linear_speed=-linear_speed)
         ),
-        7: Action(
-            start_timestamp=current_timestamp,
+        Action(
             duration_millis=500,
             action_type=ActionType.stand,
             params={}
         )
-    }
-
-    return catalog[random.randint(1, 7)]
+    ]
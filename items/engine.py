@@ -0,0 +1,320 @@
+import math
+from typing import List, Sequence, Tuple
+
+import numpy as np
+from pygame import Rect
+
+from util import Grid, WallLayer
+
+from . import Dynamic
+from .actions import Action, ActionType, Orientation
+
+TWO_PI = 2 * math.pi
+
+# x, y, alpha, orientation, image index, action, linear and angular speed,
+# fractions of pixel moved along x and y
+EngineState = Tuple[np.ndarray, ...]
+
+
+class KinematicsEngine:
+    """
+    Kinematics of many dynamic items, advanced all together.
+
+    Positions, orientations, speeds and animation state are stored in numpy
+    arrays (one entry per item) and updated by a single batched step,
+    equivalent to calling `Dynamic.act` on each item. The items are bound
+    to the engine, so that their rect, orientation and image are read
+    straight from the arrays: no copy back is needed.
+
+    Walls are looked up in the grid wall layer, only in the cells covered
+    by the moves: moves near walls are swept by the grid, as for the items
+    not bound.
+    """
+
+    def __init__(self, dynamics: Sequence[Dynamic], area: Rect, grid: Grid) -> None:
+        self.__dynamics: List[Dynamic] = list(dynamics)
+        self.__area = Rect(area)
+        self.__grid = grid
+
+        rects = [d.rect for d in self.__dynamics]
+        n = len(rects)
+
+        self.__x = np.array([r.x for r in rects], dtype=np.int64)
+        self.__y = np.array([r.y for r in rects], dtype=np.int64)
+        self.__w = np.array([r.width for r in rects], dtype=np.int64)
+        self.__h = np.array([r.height for r in rects], dtype=np.int64)
+
+        # fractions of pixel carried over to the next moves, as in `Dynamic`
+        self.__rx = np.array([d.remainder[0] for d in self.__dynamics], dtype=np.float64)
+        self.__ry = np.array([d.remainder[1] for d in self.__dynamics], dtype=np.float64)
+
+        self.__alpha = np.array([d.orientation_rad for d in self.__dynamics], dtype=np.float64)
+        self.__orientation = KinematicsEngine.__get_orientations(self.__alpha)
+
+        self.__image_idx = np.array([d.image_idx for d in self.__dynamics], dtype=np.int64)
+        self.__frames_number = np.array(
+            [len(d.frames['moving_images'][0]) for d in self.__dynamics],
+            dtype=np.int64
+        )
+
+        self.__action = np.zeros(n, dtype=np.int8)
+        self.__linear_speed = np.zeros(n, dtype=np.float64)
+        self.__angular_speed = np.zeros(n, dtype=np.float64)
+
+        # rects are kept built, so that reading them does not allocate
+        self.__rects: List[Rect] = [Rect(r) for r in rects]
+
+        for idx, d in enumerate(self.__dynamics):
+            self.set_action(idx, d.action)
+            d.bind(self, idx)
+
+    @staticmethod
+    def __get_orientations(alpha: np.ndarray) -> np.ndarray:
+        # same as Orientation.get_orientation
+        return (np.round(2 - 4 * alpha / math.pi) % 8).astype(np.int64)
+
+    def __get_states(self, x: np.ndarray, y: np.ndarray, w: np.ndarray, h: np.ndarray) -> np.ndarray:
+        """
+        Highest wall state of the cells overlapped by each rect, for rects
+        lying in the grid.
+        """
+        walls = self.__grid.walls
+        cw, ch = self.__grid.cell_size
+        sx, sy = walls.size
+
+        x0 = x // cw
+        y0 = y // ch
+        x1 = (x + w - 1) // cw
+        y1 = (y + h - 1) // ch
+
+        state = np.zeros(len(x), dtype=np.uint8)
+
+        if len(x) == 0:
+            return state
+
+        # the covered cells are visited by their offset from the first one
+        for di in range(int((x1 - x0).max()) + 1):
+            i = x0 + di
+            valid_i = i <= x1
+            i = np.minimum(i, sx - 1)
+
+            for dj in range(int((y1 - y0).max()) + 1):
+                j = y0 + dj
+                valid = valid_i & (j <= y1)
+                j = np.minimum(j, sy - 1)
+
+                state = np.maximum(state, np.where(valid, walls.get_states(i, j), WallLayer.FREE))
+
+        return state
+
+    def set_action(self, idx: int, action: Action):
+        params = action.get('params') or {}
+
+        self.__action[idx] = action['action_type'].value
+        self.__linear_speed[idx] = params.get('linear_speed', 0)
+        self.__angular_speed[idx] = params.get('angular_speed', 0)
+
+    def set_orientation(self, idx: int, alpha: float):
+        self.__alpha[idx] = alpha
+        self.__orientation[idx] = Orientation.get_orientation(alpha).value
+
+    def step(self, dt: float):
+        action = self.__action
+
+        self.__image_idx[action == ActionType.stand.value] = 0
+
+        rotating = np.flatnonzero(action == ActionType.rotate.value)
+
+        if rotating.size:
+            alpha = self.__alpha[rotating] + dt * self.__angular_speed[rotating]
+
+            while (alpha < 0).any():
+                alpha = np.where(alpha < 0, TWO_PI + alpha, alpha)
+
+            while (alpha > TWO_PI).any():
+                alpha = np.where(alpha > TWO_PI, alpha - TWO_PI, alpha)
+
+            self.__alpha[rotating] = alpha
+            self.__orientation[rotating] = KinematicsEngine.__get_orientations(alpha)
+
+        moving = np.flatnonzero(
+            (action == ActionType.move.value) | (action == ActionType.hunt.value)
+        )
+
+        if moving.size == 0:
+            return
+
+        l_speed = self.__linear_speed[moving]
+        ds = dt * l_speed
+        alpha = self.__alpha[moving]
+
+        fx = self.__rx[moving] + ds * np.cos(alpha)
+        fy = self.__ry[moving] - ds * np.sin(alpha)
+
+        # as Rect.move, the position is moved by the truncated offsets
+        dx = np.trunc(fx).astype(np.int64)
+        dy = np.trunc(fy).astype(np.int64)
+
+        # offsets asked for, before the slides against walls
+        ask_x = dx.copy()
+        ask_y = dy.copy()
+
+        x = self.__x[moving]
+        y = self.__y[moving]
+        w = self.__w[moving]
+        h = self.__h[moving]
+
+        # Items whose whole move lies in the area and in cells with no walls
+        # get there at once: the others sweep their path as `Dynamic.act`
+        # does, sliding along the walls they hit.
+        box_x = np.minimum(x, x + dx)
+        box_y = np.minimum(y, y + dy)
+        box_w = w + np.abs(dx)
+        box_h = h + np.abs(dy)
+
+        # moves shorter than a pixel are never blocked
+        still = (dx == 0) & (dy == 0)
+
+        area = self.__area
+        free = (box_x >= area.left) & (box_y >= area.top) \
+            & (box_x + box_w <= area.right) & (box_y + box_h <= area.bottom)
+
+        inside = np.flatnonzero(free)
+        free[inside] = self.__get_states(
+            box_x[inside],
+            box_y[inside],
+            box_w[inside],
+            box_h[inside]
+        ) == WallLayer.FREE
+
+        for k in np.flatnonzero(~free).tolist():
+            dx[k], dy[k] = self.__grid.slide(
+                Rect(int(x[k]), int(y[k]), int(w[k]), int(h[k])),
+                int(dx[k]),
+                int(dy[k]),
+                area
+            )
+
+        # against a wall, nothing is carried over
+        self.__rx[moving] = np.where(dx == ask_x, fx - ask_x, 0.0)
+        self.__ry[moving] = np.where(dy == ask_y, fy - ask_y, 0.0)
+
+        # only the items which could not move at all stand
+        can_move = free | still | (dx != 0) | (dy != 0)
+
+        for idx in moving[~can_move]:
+            self.__dynamics[idx].start_action(
+                Action(action_type=ActionType.stand, params={}),
+                current_timestamp=0,
+                force=True
+            )
+
+        x = x + dx
+        y = y + dy
+
+        moved = moving[can_move]
+
+        if moved.size == 0:
+            return
+
+        old_x = self.__x[moved]
+        old_y = self.__y[moved]
+
+        self.__x[moved] = x[can_move]
+        self.__y[moved] = y[can_move]
+
+        for idx, rx, ry in zip(moved.tolist(), x[can_move].tolist(), y[can_move].tolist()):
+            rect = self.__rects[idx]
+            self.__rects[idx] = Rect(rx, ry, rect.width, rect.height)
+
+        frame_step = np.where(l_speed[can_move] > 0, 1, -1)
+        self.__image_idx[moved] = (self.__image_idx[moved] + frame_step) % self.__frames_number[moved]
+
+        # the grid is updated only for the items which changed cells
+        cw, ch = self.__grid.cell_size
+        w = self.__w[moved]
+        h = self.__h[moved]
+        new_x = self.__x[moved]
+        new_y = self.__y[moved]
+
+        changed = (old_x // cw != new_x // cw) | (old_y // ch != new_y // ch) \
+            | ((old_x + w) // cw != (new_x + w) // cw) \
+            | ((old_y + h) // ch != (new_y + h) // ch)
+
+        for k in np.flatnonzero(changed):
+            idx = moved[k]
+
+            self.__grid.move_item(
+                self.__dynamics[idx],
+                Rect(int(old_x[k]), int(old_y[k]), int(w[k]), int(h[k])),
+                self.get_rect(idx)
+            )
+
+    def snapshot(self) -> EngineState:
+        """
+        Copy of the kinematic state, to get back to with `restore`.
+        """
+        return tuple(a.copy() for a in (
+            self.__x,
+            self.__y,
+            self.__alpha,
+            self.__orientation,
+            self.__image_idx,
+            self.__action,
+            self.__linear_speed,
+            self.__angular_speed,
+            self.__rx,
+            self.__ry
+        ))
+
+    def restore(self, state: EngineState):
+        x, y = state[0], state[1]
+        changed = np.flatnonzero((x != self.__x) | (y != self.__y))
+
+        for a, saved in zip((
+            self.__x,
+            self.__y,
+            self.__alpha,
+            self.__orientation,
+            self.__image_idx,
+            self.__action,
+            self.__linear_speed,
+            self.__angular_speed,
+            self.__rx,
+            self.__ry
+        ), state):
+            a[:] = saved
+
+        for idx in changed.tolist():
+            old_rect = self.__rects[idx]
+            self.__rects[idx] = Rect(int(x[idx]), int(y[idx]), old_rect.width, old_rect.height)
+
+            self.__grid.move_item(self.__dynamics[idx], old_rect, self.__rects[idx])
+
+    def get_rect(self, idx: int) -> Rect:
+        return self.__rects[idx]
+
+    def get_alpha(self, idx: int) -> float:
+        return float(self.__alpha[idx])
+
+    def get_remainder(self, idx: int) -> Tuple[float, float]:
+        return float(self.__rx[idx]), float(self.__ry[idx])
+
+    def get_frame(self, idx: int):
+        return int(self.__orientation[idx]), int(self.__image_idx[idx])
+
+    def release(self):
+        """
+        Gives the kinematic state back to the items.
+        """
+        for idx, d in enumerate(self.__dynamics):
+            d.unbind(
+                self.get_rect(idx),
+                self.get_alpha(idx),
+                int(self.__image_idx[idx]),
+                self.get_remainder(idx)
+            )
+
+    @property
+    def dynamics(self) -> List[Dynamic]:
+        return self.__dynamics
@@ -1,14 +1,53 @@
-from typing import Tuple
+from itertools import count
+from typing import Dict, Optional, Tuple
 
+import numpy as np
 import pygame as pg
 from pygame import Rect, Surface
 
-from items import Dynamic, Static, extract_frames
-from util import Grid, ItemType
+from items import Dynamic, Frames, Static, extract_frames
+from items.maps import STONE_TILE, WALL_TILE, compile_map, load_map
+from util import Grid, ItemType, load_image
+
+SPARSE_GRID_MIN_CELLS = 1000000
+GRID_CHUNK_SIZE = 16
+
+# Assets shared by all the items, loaded once per process. Frames are
+# subsurfaces of their sprite sheet, hence they share its pixels.
+__images: Dict[str, Surface] = {}
+__frames: Dict[Tuple[str, Tuple[int, int]], Frames] = {}
+
+
+def get_image(path: str) -> Surface:
+    image = __images.get(path)
+
+    if image is None:
+        image = __images[path] = load_image(path)
+
+    return image
+
+
+def get_frames(path: str, frame_size: Tuple[int, int]) -> Frames:
+    key = (path, tuple(frame_size))
+    frames = __frames.get(key)
+
+    if frames is None:
+        frames = __frames[key] = extract_frames(path, frame_size=frame_size)
+
+    return frames
+
+
+def clear_assets():
+    """
+    Drops the loaded assets, e.g. to convert them again once the display
+    mode is set.
+    """
+    __images.clear()
+    __frames.clear()
 
 
 def build_main_character(
-        id: str,
+        id: int,
         x: int,
         y: int,
         frame_size: Tuple[int, int],
@@ -19,12 +58,12 @@ def build_main_character(
         item_type=ItemType.character,
         x=x,
         y=y,
-        frames=extract_frames(frame_img_path, frame_size=frame_size)
+        frames=get_frames(frame_img_path, frame_size=frame_size)
     )
 
 
 def build_monster(
-        id: str,
+        id: int,
         x: int,
         y: int,
         frame_size: Tuple[int, int],
@@ -35,12 +74,12 @@ def build_monster(
         item_type=ItemType.monster,
         x=x,
         y=y,
-        frames=extract_frames(frame_img_path, frame_size=frame_size)
+        frames=get_frames(frame_img_path, frame_size=frame_size)
     )
 
 
 def build_wall(
-        id: str,
+        id: int,
         x: int,
         y: int,
         frame_img_path: str
@@ -50,12 +89,12 @@ def build_wall(
         item_type=ItemType.wall,
         x=x,
         y=y,
-        image=pg.image.load(frame_img_path).convert_alpha()
+        image=get_image(frame_img_path)
     )
 
 
 def build_consumable(
-        id: str,
+        id: int,
         x: int,
         y: int,
         value: int,
@@ -66,101 +105,147 @@ def build_consumable(
         item_type=ItemType.bonus if value > 0 else ItemType.malus,
         x=x,
         y=y,
-        image=pg.image.load(frame_img_path).convert_alpha(),
+        image=get_image(frame_img_path),
         value=value * (1 if value > 0 else -1)
     )
 
 
 class Provider:
     def __init__(self, def_file: str) -> None:
-        import yaml
+        # the definition is compiled (once for each content) to a binary
+        # map, which is much faster to load
+        map_data = load_map(compile_map(def_file))
 
-        with open(def_file, 'r') as f:
-            data = yaml.load(f, Loader=yaml.FullLoader)
+        self.__cell_width, self.__cell_height = map_data['cell_size']
+        self.__grid_width, self.__grid_height = map_data['grid_size']
 
-        self.__cell_width: int = data['cell_width']
-        self.__cell_height: int = data['cell_height']
-
-        map_str: str = data['map']
-
-        rows = map_str.splitlines()
-
-        self.__grid_width = max([len(row) for row in rows])
-        self.__grid_height = len(rows)
+        # large maps are mostly empty: their grid is allocated sparsely
+        if self.__grid_width * self.__grid_height > SPARSE_GRID_MIN_CELLS:
+            chunk_size = GRID_CHUNK_SIZE
+        else:
+            chunk_size = None
 
         self.__grid = Grid(
             cell_size=(self.__cell_width, self.__cell_height),
-            grid_size=(self.__grid_width, self.__grid_height)
+            grid_size=(self.__grid_width, self.__grid_height),
+            chunk_size=chunk_size
         )
-        window_width = self.__cell_width * self.__grid_width
-        window_height = self.__cell_height * self.__grid_height
 
-        self.__game_area = Surface((window_width, window_height))
+        # the game area is never drawn as a whole: only its size is kept
+        self.__area = Rect((0, 0), self.__grid.area)
 
         self.__static_sprites = pg.sprite.Group()
         self.__interactive_sprites = pg.sprite.Group()
         self.__dynamic_sprites = pg.sprite.Group()
         self.__main_sprites = pg.sprite.Group()
 
-        for j in range(len(rows)):
-            row = rows[j]
-            for i in range(len(row)):
-                if row[i] == 'W':
-                    wall = build_wall(
-                        id=f'wall-{i}-{j}',
-                        x=(i + .5) * self.__cell_width,
-                        y=(j + .5) * self.__cell_height,
-                        frame_img_path='images/wall.png'
-                    )
-
-                    self.__grid.insert_item(wall)
-                    self.__static_sprites.add(wall)
-
-                if row[i] == 'S':
-                    stone = build_wall(
-                        id=f'stone-{i}-{j}',
-                        x=(i + .5) * self.__cell_width,
-                        y=(j + .5) * self.__cell_height,
-                        frame_img_path='images/medium_stone.png'
-                    )
-
-                    self.__grid.insert_item(stone)
-                    self.__static_sprites.add(stone)
-
-                if row[i] == 'a':
-                    self.insert_apple(i, j)
-
-                if row[i] == 'b':
-                    self.insert_bad_apple(i, j)
+        # items are identified by integers, in the order they are created
+        self.__ids = count()
+
+        tiles = map_data['tiles']
+
+        self.__wall_image = get_image('images/wall.png')
+        walls = tiles == WALL_TILE
+        self.__wall_tiles = np.zeros((0, 0), dtype=bool)
+
+        if self.__wall_image.get_size() == (self.__cell_width, self.__cell_height):
+            # walls fitting their cell are kept as a tiles layer, with no
+            # item for each of them
+            self.__grid.walls.add_tiles(walls)
+            self.__wall_tiles = walls
+        else:
+            for j, i in zip(*np.nonzero(walls.T)):
+                self.insert_wall(int(i), int(j))
+
+        for j, i in zip(*np.nonzero(tiles.T == STONE_TILE)):
+            self.insert_stone(int(i), int(j))
+
+        for kind, i, j in map_data['spawns'].tolist():
+            if kind == b'a':
+                self.insert_apple(i, j)
+
+            if kind == b'b':
+                self.insert_bad_apple(i, j)
+
+            if kind == b'c':
+                self.__main_character = build_main_character(
+                    id=next(self.__ids),
+                    x=(i + .5) * self.__cell_width,
+                    y=(j + .5) * self.__cell_height,
+                    frame_size=(32, 32),
+                    frame_img_path='images/man.png'
+                )
+
+                self.__grid.insert_item(self.__main_character)
+                self.__main_sprites.add(self.__main_character)
+
+            if kind == b'm':
+                monster = build_monster(
+                    id=next(self.__ids),
+                    x=(i + .5) * self.__cell_width,
+                    y=(j + .5) * self.__cell_height,
+                    frame_size=(56, 56),
+                    frame_img_path='images/monster.png'
+                )
+                monster.item_status.value = 7
+
+                self.__grid.insert_item(monster)
+                self.__dynamic_sprites.add(monster)
+
+    def insert_wall(self, i: int, j: int):
+        wall = build_wall(
+            id=next(self.__ids),
+            x=(i + .5) * self.__cell_width,
+            y=(j + .5) * self.__cell_height,
+            frame_img_path='images/wall.png'
+        )
 
-                if row[i] == 'c':
-                    self.__main_character = build_main_character(
-                        id=f'main_character-{i}-{j}',
-                        x=(i + .5) * self.__cell_width,
-                        y=(j + .5) * self.__cell_height,
-                        frame_size=(32, 32),
-                        frame_img_path='images/man.png'
-                    )
+        self.__grid.insert_item(wall)
+        self.__static_sprites.add(wall)
 
-                    self.__grid.insert_item(self.__main_character)
-                    self.__main_sprites.add(self.__main_character)
+    def insert_stone(self, i: int, j: int):
+        stone = build_wall(
+            id=next(self.__ids),
+            x=(i + .5) * self.__cell_width,
+            y=(j + .5) * self.__cell_height,
+            frame_img_path='images/medium_stone.png'
+        )
 
-                if row[i] == 'm':
-                    monster = build_monster(
-                        id=f'monster-{i}-{j}',
-                        x=(i + .5) * self.__cell_width,
-                        y=(j + .5) * self.__cell_height,
-                        frame_size=(56, 56),
-                        frame_img_path='images/monster.png'
+        self.__grid.insert_item(stone)
+        self.__static_sprites.add(stone)
+
+    def draw_walls(self, surface: Surface, area: Optional[Rect] = None):
+        """
+        Draws the walls kept as tiles, which have no sprite. When `area` is
+        given, only the walls overlapping it are drawn, and the area origin
+        is placed at the origin of the surface.
+        """
+        if area is None:
+            area = self.__area
+
+        x0 = max(area.left // self.__cell_width, 0)
+        y0 = max(area.top // self.__cell_height, 0)
+        x1 = (area.right - 1) // self.__cell_width
+        y1 = (area.bottom - 1) // self.__cell_height
+
+        tiles = self.__wall_tiles[x0:x1 + 1, y0:y1 + 1]
+
+        surface.blits(
+            [
+                (
+                    self.__wall_image,
+                    (
+                        (x0 + i) * self.__cell_width - area.left,
+                        (y0 + j) * self.__cell_height - area.top
                     )
-                    monster.item_status['value'] = 7
-
-                    self.__grid.insert_item(monster)
-                    self.__dynamic_sprites.add(monster)
+                ) for i, j in zip(*np.nonzero(tiles))
+            ],
+            doreturn=False
+        )
 
     def insert_bad_apple(self, i: int, j: int):
         apple = build_consumable(
-            id=f'bad-apple-{i}-{j}',
+            id=next(self.__ids),
             x=(i + .5) * self.__cell_width,
             y=(j + .5) * self.__cell_height,
             frame_img_path='images/bad_apple.png',
@@ -172,7 +257,7 @@ class Provider:
 
     def insert_apple(self,  i: int, j: int):
         apple = build_consumable(
-            id=f'apple-{i}-{j}',
+            id=next(self.__ids),
             x=(i + .5) * self.__cell_width,
             y=(j + .5) * self.__cell_height,
             frame_img_path='images/apple.png',
@@ -191,8 +276,8 @@ class Provider:
         return self.__grid_height
 
     @property
-    def game_area(self) -> pg.Surface:
-        return self.__game_area
+    def area(self) -> Rect:
+        return self.__area
 
     @property
     def grid(self) -> Grid:
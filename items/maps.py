@@ -0,0 +1,134 @@
+import hashlib
+import os
+from typing import Tuple, TypedDict
+
+import numpy as np
+
+CACHE_DIR = '.map_cache'
+
+# to be increased whenever the parsing or the layout of compiled maps
+# change, so that the files already compiled are not loaded anymore
+MAP_FORMAT_VERSION = 1
+
+# codes of the tiles layer
+NO_TILE = 0
+WALL_TILE = 1
+STONE_TILE = 2
+
+TILE_CODES = {
+    'W': WALL_TILE,
+    'S': STONE_TILE
+}
+
+# entities spawned on the map, as (kind, i, j) records
+SPAWN_KINDS = 'abcm'
+SPAWN_DTYPE = np.dtype([('kind', 'S1'), ('i', '<i4'), ('j', '<i4')])
+
+
+class MapData(TypedDict):
+    cell_size: Tuple[int, int]
+    grid_size: Tuple[int, int]
+    # tile codes, indexed as [i, j]
+    tiles: np.ndarray
+    # spawn records, in map order (row by row)
+    spawns: np.ndarray
+
+
+def parse_map(def_file: str) -> MapData:
+    import yaml
+
+    with open(def_file, 'r') as f:
+        data = yaml.load(f, Loader=yaml.FullLoader)
+
+    rows = data['map'].splitlines()
+
+    grid_width = max([len(row) for row in rows])
+    grid_height = len(rows)
+
+    chars = np.frombuffer(
+        ''.join(row.ljust(grid_width) for row in rows).encode('ascii'),
+        dtype='S1'
+    ).reshape(grid_height, grid_width)
+
+    tiles = np.full((grid_height, grid_width), NO_TILE, dtype=np.uint8)
+
+    for c, code in TILE_CODES.items():
+        tiles[chars == c.encode('ascii')] = code
+
+    # nonzero walks the rows in order, as the map is read
+    js, is_ = np.nonzero(np.isin(chars, [c.encode('ascii') for c in SPAWN_KINDS]))
+
+    spawns = np.empty(len(js), dtype=SPAWN_DTYPE)
+    spawns['kind'] = chars[js, is_]
+    spawns['i'] = is_
+    spawns['j'] = js
+
+    return MapData(
+        cell_size=(data['cell_width'], data['cell_height']),
+        grid_size=(grid_width, grid_height),
+        tiles=np.ascontiguousarray(tiles.T),
+        spawns=spawns
+    )
+
+
+def save_map(map_data: MapData, path: str):
+    # written aside and then moved, so that a partial file is never loaded
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+
+    with open(tmp_path, 'wb') as f:
+        np.savez(
+            f,
+            header=np.array(
+                [MAP_FORMAT_VERSION, *map_data['cell_size'], *map_data['grid_size']],
+                dtype=np.int64
+            ),
+            tiles=map_data['tiles'],
+            spawns=map_data['spawns']
+        )
+
+    os.replace(tmp_path, path)
+
+
+def load_map(path: str) -> MapData:
+    with np.load(path) as data:
+        header = data['header'].tolist()
+
+        if len(header) != 5 or header[0] != MAP_FORMAT_VERSION:
+            raise ValueError(f'{path} is not a compiled map of version {MAP_FORMAT_VERSION}')
+
+        _, cell_width, cell_height, grid_width, grid_height = header
+
+        return MapData(
+            cell_size=(cell_width, cell_height),
+            grid_size=(grid_width, grid_height),
+            tiles=data['tiles'],
+            spawns=data['spawns']
+        )
+
+
+def compile_map(def_file: str, cache_dir: str = CACHE_DIR) -> str:
+    """
+    Compiles the map definition into its binary form, unless already done
+    for the same content and format version. Returns the path of the
+    compiled file.
+    """
+    with open(def_file, 'rb') as f:
+        sha = hashlib.sha256(f'{MAP_FORMAT_VERSION}\n'.encode('ascii'))
+        sha.update(f.read())
+        digest = sha.hexdigest()[:16]
+
+    name = os.path.splitext(os.path.basename(def_file))[0]
+    path = os.path.join(cache_dir, f'{name}-{digest}.npz')
+
+    if not os.path.exists(path):
+        os.makedirs(cache_dir, exist_ok=True)
+        save_map(parse_map(def_file), path)
+
+    return path
+
+
+if __name__ == '__main__':
+    import sys
+
+    for def_file in sys.argv[1:]:
+        print(compile_map(def_file))
@@ -0,0 +1,115 @@
+import math
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from util.scheduler import Event, Scheduler
+
+from . import Dynamic
+from .actions import Action, get_random_catalog
+
+
+# generator state, agents to act and pending expirations
+PolicyState = Tuple[Dict[str, Any], List[Dynamic], Dict[Dynamic, Event]]
+
+
+class RandomPolicy:
+    """
+    Random actions for many agents at once.
+
+    Actions are picked from a catalog built once, with a single draw for
+    all the agents whose current action expired. Expirations are events of
+    the scheduler, rescheduled each time an agent starts an action: agents
+    still acting are not even visited.
+    """
+
+    def __init__(
+            self,
+            agents: Sequence[Dynamic],
+            scheduler: Scheduler,
+            linear_speed: float = 20,
+            angular_speed: float = math.pi,
+            rng: Optional[np.random.Generator] = None
+    ) -> None:
+        self.__catalog = get_random_catalog(linear_speed, angular_speed)
+        self.__rng = rng if rng is not None else np.random.default_rng()
+        self.__scheduler = scheduler
+
+        # agents whose action expired (as an ordered set)
+        self.__ready: Dict[Dynamic, None] = {}
+        self.__expirations: Dict[Dynamic, Event] = {}
+
+        for agent in agents:
+            agent.action_listener = self.__on_action_started
+            self.__on_action_started(agent)
+
+    def __on_action_started(self, agent: Dynamic):
+        expiration = self.__expirations.pop(agent, None)
+
+        if expiration is not None:
+            expiration.cancel()
+
+        self.__ready.pop(agent, None)
+
+        action = agent.action
+
+        # same condition as Dynamic.action_expired
+        if 'start_timestamp' in action:
+            self.__expirations[agent] = self.__scheduler.schedule(
+                action['start_timestamp'] + (action['duration_millis'] or 0),
+                self.__expire,
+                agent
+            )
+        else:
+            self.__ready[agent] = None
+
+    def __expire(self, agent: Dynamic):
+        del self.__expirations[agent]
+        self.__ready[agent] = None
+
+    def act(self, current_timestamp: int) -> int:
+        """
+        Starts a new action for the agents whose action expired. Returns the
+        number of agents sampled.
+        """
+        if not self.__ready:
+            return 0
+
+        expired = list(self.__ready)
+        self.__ready.clear()
+
+        picks = self.__rng.integers(len(self.__catalog), size=len(expired))
+
+        for agent, k in zip(expired, picks.tolist()):
+            agent.start_action(
+                {**self.__catalog[k], 'start_timestamp': current_timestamp},
+                current_timestamp=current_timestamp,
+                force=True
+            )
+
+        return len(expired)
+
+    def snapshot(self) -> PolicyState:
+        """
+        State of the random generator and of the agents, to get back to
+        with `restore`.
+        """
+        return self.__rng.bit_generator.state, list(self.__ready), dict(self.__expirations)
+
+    def restore(self, state: PolicyState):
+        rng_state, ready, expirations = state
+
+        self.__rng.bit_generator.state = rng_state
+        self.__ready = dict.fromkeys(ready)
+        self.__expirations = dict(expirations)
+
+    def get_expiration(self, agent: Dynamic, due: int) -> Event:
+        """
+        A (not scheduled) expiration event of the agent, as the policy would
+        schedule: to rebuild the state of a saved snapshot.
+        """
+        return Event(due, self.__expire, (agent,))
+
+    @property
+    def catalog(self) -> List[Action]:
+        return self.__catalog
@@ -0,0 +1,240 @@
+import argparse
+import bisect
+import json
+import math
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from items.actions import Action, get_keyboard_catalog
+from items.world import PackedSnapshot, World
+
+REPLAY_VERSION = 2
+
+# ticks between keyframes (10 seconds at 25 FPS)
+KEYFRAME_TICKS = 250
+
+# one record per tick: the action of the main character is its index in the
+# keyboard catalog, or NO_ACTION when it was left to its policy
+TICK_DTYPE = np.dtype([
+    ('timestamp', '<u4'),
+    ('dt_millis', '<u2'),
+    ('action', 'u1')
+])
+
+NO_ACTION = 255
+
+
+def get_action_code(catalog: List[Action], action: Optional[Action]) -> int:
+    if action is None:
+        return NO_ACTION
+
+    for code, a in enumerate(catalog):
+        if a['action_type'] == action['action_type'] and a['params'] == action['params']:
+            return code
+
+    raise ValueError(f'action {action} is not in the keyboard catalog')
+
+
+class ReplayRecorder:
+    """
+    Records a session as the actions of the main character at each tick,
+    along with the seed of the random actions: the rest is re-simulated on
+    playback.
+
+    A packed snapshot of the world is kept every `keyframe_ticks` ticks, to
+    seek without simulating from the start.
+    """
+
+    def __init__(
+            self,
+            path: str,
+            config: str,
+            seed: int,
+            vectorized: bool = False,
+            random_main_char: bool = False,
+            linear_speed: float = 100,
+            angular_speed: float = math.pi,
+            keyframe_ticks: int = KEYFRAME_TICKS
+    ) -> None:
+        self.__path = path
+        self.__header = dict(
+            version=REPLAY_VERSION,
+            config=config,
+            seed=seed,
+            vectorized=vectorized,
+            random_main_char=random_main_char,
+            linear_speed=linear_speed,
+            angular_speed=angular_speed,
+            keyframe_ticks=keyframe_ticks
+        )
+
+        self.__catalog = get_keyboard_catalog(linear_speed, angular_speed)
+        self.__keyframe_ticks = keyframe_ticks
+
+        self.__ticks: List[Tuple[int, int, int]] = []
+        self.__keyframes: Dict[int, PackedSnapshot] = {}
+
+    def record(self, world: World, dt_millis: int, current_timestamp: int, action: Optional[Action]):
+        """
+        Records the tick about to be stepped: to be called before
+        `World.step`.
+        """
+        tick = len(self.__ticks)
+
+        if tick % self.__keyframe_ticks == 0:
+            self.__keyframes[tick] = world.pack(world.snapshot())
+
+        self.__ticks.append((current_timestamp, dt_millis, get_action_code(self.__catalog, action)))
+
+    def save(self):
+        arrays = {
+            'header': np.array(json.dumps(self.__header)),
+            'ticks': np.array(self.__ticks, dtype=TICK_DTYPE),
+            'keyframes': np.array(sorted(self.__keyframes), dtype=np.int64)
+        }
+
+        for tick, packed in self.__keyframes.items():
+            for name, a in packed.items():
+                arrays[f'{tick}/{name}'] = a
+
+        # written aside and then moved, so that a partial file is never loaded
+        tmp_path = f'{self.__path}.{os.getpid()}.tmp'
+
+        with open(tmp_path, 'wb') as f:
+            np.savez_compressed(f, **arrays)
+
+        os.replace(tmp_path, self.__path)
+
+    @property
+    def ticks(self) -> int:
+        return len(self.__ticks)
+
+
+class ReplayPlayer:
+    """
+    Re-simulates a recorded session, with no display, as fast as possible.
+
+    Seeking restores the closest keyframe before the target tick, unless
+    simulating from the current tick is shorter.
+    """
+
+    def __init__(self, path: str) -> None:
+        with np.load(path) as data:
+            self.__header = json.loads(str(data['header']))
+
+            if self.__header['version'] != REPLAY_VERSION:
+                raise ValueError(f'unsupported replay version {self.__header["version"]}')
+
+            self.__ticks = data['ticks']
+            self.__keyframe_ticks: List[int] = data['keyframes'].tolist()
+            self.__keyframes: Dict[int, PackedSnapshot] = {
+                tick: {} for tick in self.__keyframe_ticks
+            }
+
+            for key in data.files:
+                if '/' in key:
+                    tick, name = key.split('/')
+                    self.__keyframes[int(tick)][name] = data[key]
+
+        self.__catalog = get_keyboard_catalog(
+            self.__header['linear_speed'],
+            self.__header['angular_speed']
+        )
+
+        self.__world = World(
+            self.__header['config'],
+            vectorized=self.__header['vectorized'],
+            seed=self.__header['seed'],
+            random_main_char=self.__header['random_main_char']
+        )
+        self.__tick = 0
+
+    def step(self):
+        """
+        Simulates the next tick.
+        """
+        timestamp, dt_millis, code = self.__ticks[self.__tick].tolist()
+
+        if code == NO_ACTION:
+            action = None
+        else:
+            action = {**self.__catalog[code], 'start_timestamp': timestamp}
+
+        self.__world.step(dt_millis / 1000.0, timestamp, action)
+        self.__tick += 1
+
+    def seek(self, tick: int):
+        """
+        Brings the world to its state before the given tick.
+        """
+        tick = min(max(tick, 0), len(self.__ticks))
+
+        k = bisect.bisect_right(self.__keyframe_ticks, tick) - 1
+
+        if k >= 0:
+            keyframe = self.__keyframe_ticks[k]
+
+            if tick < self.__tick or keyframe > self.__tick:
+                self.__world.restore(self.__world.unpack(self.__keyframes[keyframe]))
+                self.__tick = keyframe
+
+        if tick < self.__tick:
+            raise ValueError(f'no keyframe before tick {tick}')
+
+        while self.__tick < tick:
+            self.step()
+
+    def play(self):
+        self.seek(len(self.__ticks))
+
+    @property
+    def world(self) -> World:
+        return self.__world
+
+    @property
+    def header(self) -> dict:
+        return self.__header
+
+    @property
+    def tick(self) -> int:
+        return self.__tick
+
+    @property
+    def ticks(self) -> int:
+        return len(self.__ticks)
+
+    @property
+    def timestamp(self) -> int:
+        """
+        Game time of the next tick to simulate.
+        """
+        if self.__tick < len(self.__ticks):
+            return int(self.__ticks[self.__tick]['timestamp'])
+
+        return int(self.__ticks[-1]['timestamp']) if len(self.__ticks) else 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Plays a recorded session back, with no display')
+    parser.add_argument('path', help='replay file')
+    parser.add_argument(
+        '--seek',
+        type=int,
+        default=None,
+        help='tick to stop at (the end by default)'
+    )
+    args = parser.parse_args()
+
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+    player = ReplayPlayer(args.path)
+
+    t = time.perf_counter()
+    player.seek(player.ticks if args.seek is None else args.seek)
+    elapsed = time.perf_counter() - t
+
+    print(f'tick {player.tick} of {player.ticks} ({player.timestamp} ms) in {elapsed:.2f} s')
+    print(f'score {player.world.main_character.item_status.score}')
@@ -1,82 +1,230 @@
-import pygame as pg
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
 
 from util import Item, ItemType
 
 from . import Dynamic
 from .actions import ActionType
 
+# A rule is applied at once to all the colliding pairs of two given types:
+# it gets the items of each pair and returns, for each pair, the score
+# gained by the first item and whether the second one is consumed.
+Effects = Tuple[np.ndarray, np.ndarray]
+Rule = Callable[[Sequence[Dynamic], Sequence[Item], int], Effects]
 
-def __consume_bonus_item(self: Dynamic, item: Item, _: int) -> bool:
-    if self.action['action_type'] is not ActionType.pick:
-        return False
-
-    current_score = self.item_status['score']
-    current_score += item.item_status['value']
+# A reaction changes the items of the pairs of two given types (e.g. their
+# actions): unlike rules, it's only applied to the pairs still colliding
+# once the consumed items are removed.
+Reaction = Callable[[Sequence[Dynamic], Sequence[Item], int], None]
 
-    self.item_status['score'] = current_score
 
-    item.item_status['removed'] = True
+def __get_values(items: Sequence[Item]) -> np.ndarray:
+    return np.fromiter((i.item_status.value for i in items), dtype=np.int64, count=len(items))
 
-    return True
 
+def __get_doing(items: Sequence[Dynamic], action_type: ActionType) -> np.ndarray:
+    return np.fromiter(
+        (i.action['action_type'] is action_type for i in items),
+        dtype=bool,
+        count=len(items)
+    )
 
-def __consume_malus_item(self: Dynamic, item: Item, _: int) -> bool:
-    if self.action['action_type'] is not ActionType.pick:
-        return False
 
-    current_score = self.item_status['score']
-    current_score -= item.item_status['value']
+def __consume_bonus_item(selves: Sequence[Dynamic], items: Sequence[Item], _: int) -> Effects:
+    picking = __get_doing(selves, ActionType.pick)
 
-    self.item_status['score'] = current_score
+    return np.where(picking, __get_values(items), 0), picking
 
-    item.item_status['removed'] = True
 
-    return True
+def __consume_malus_item(selves: Sequence[Dynamic], items: Sequence[Item], _: int) -> Effects:
+    picking = __get_doing(selves, ActionType.pick)
 
+    return np.where(picking, -__get_values(items), 0), picking
 
-def __get_bite(self: Dynamic, item: Dynamic, _: int):
-    a = item.action
-    at = a['action_type']
 
-    if at is ActionType.hunt:
-        current_score = self.item_status['score']
-        current_score -= item.item_status['value']
+def __get_bite(selves: Sequence[Dynamic], items: Sequence[Dynamic], _: int) -> Effects:
+    hunting = __get_doing(items, ActionType.hunt)
 
-        self.item_status['score'] = current_score
+    return np.where(hunting, -__get_values(items), 0), np.zeros(len(items), dtype=bool)
 
 
-MAIN_CHAR_COLLISION = {
+MAIN_CHAR_COLLISION: Dict[ItemType, Rule] = {
     ItemType.bonus: __consume_bonus_item,
     ItemType.malus: __consume_malus_item,
     ItemType.monster: __get_bite
 }
 
 
-def __eat_item(self: Dynamic, item: Item, _: int) -> bool:
-    item.item_status['removed'] = True
+def __eat_item(selves: Sequence[Dynamic], items: Sequence[Item], _: int) -> Effects:
+    return np.zeros(len(items), dtype=np.int64), np.ones(len(items), dtype=bool)
 
-    return True
+
+MONSTER_COLLISION: Dict[ItemType, Rule] = {
+    ItemType.bonus: __eat_item,
+    ItemType.malus: __eat_item
+}
 
 
-def __bite(self: Dynamic, _: Dynamic, current_timestamp: int):
-    a = self.action
-    at = a['action_type']
+def __bite(selves: Sequence[Dynamic], items: Sequence[Dynamic], current_timestamp: int):
+    for monster in selves:
+        a = monster.action
 
-    if at is ActionType.hunt:
-        self.start_action(
-            a={
-                **a,
-                'action_type': ActionType.move,
-                'start_timestamp': current_timestamp,
-                'duration_millis': 1000
-            },
-            current_timestamp=current_timestamp,
-            force=True
-        )
+        if a['action_type'] is ActionType.hunt:
+            monster.start_action(
+                a={
+                    **a,
+                    'action_type': ActionType.move,
+                    'start_timestamp': current_timestamp,
+                    'duration_millis': 1000
+                },
+                current_timestamp=current_timestamp,
+                force=True
+            )
 
 
-MONSTER_COLLISION = {
-    ItemType.bonus: __eat_item,
-    ItemType.malus: __eat_item,
+MONSTER_REACTIONS: Dict[ItemType, Reaction] = {
     ItemType.character: __bite
 }
+
+
+class CollisionTable:
+    """
+    Collision rules compiled into a matrix indexed by the types of the two
+    colliding items.
+
+    The pairs colliding in a tick are resolved together: each rule is
+    applied once to all the pairs of its types, then scores and removals
+    are applied as array updates. An item consumed by a pair is not there
+    anymore for the following ones, whose effects are dropped, as if the
+    pairs were resolved one by one, in order. Rules all see the items as
+    they were at the start of the tick: reactions, which change them, are
+    applied last and only to the pairs left.
+    """
+
+    def __init__(
+            self,
+            rules: Dict[ItemType, Dict[ItemType, Rule]],
+            reactions: Dict[ItemType, Dict[ItemType, Reaction]]
+    ) -> None:
+        n = len(ItemType)
+
+        self.__rules: List[Optional[Rule]] = [None] * (n * n)
+        self.__reactions: List[Optional[Reaction]] = [None] * (n * n)
+        colliding_types: Dict[ItemType, Dict[ItemType, None]] = {t: {} for t in ItemType}
+
+        for table, entries in ((self.__rules, rules), (self.__reactions, reactions)):
+            for item_type, type_entries in entries.items():
+                for other_type, entry in type_entries.items():
+                    table[item_type.value * n + other_type.value] = entry
+                    colliding_types[item_type][other_type] = None
+
+        self.__colliding_types: Dict[ItemType, Tuple[ItemType, ...]] = {
+            t: tuple(types) for t, types in colliding_types.items()
+        }
+
+    def colliding_types(self, item_type: ItemType) -> Tuple[ItemType, ...]:
+        """
+        Types of the items having a rule for the given type.
+        """
+        return self.__colliding_types[item_type]
+
+    def resolve(self, pairs: Sequence[Tuple[Item, Item]], current_timestamp: int) -> List[Item]:
+        """
+        Applies the rules and then the reactions to the colliding pairs
+        (each given once, in order), returning the items consumed.
+        """
+        n = len(pairs)
+
+        if n == 0:
+            return []
+
+        # each pair is considered in both directions: entries k and k + n
+        # are the pair k
+        selves = [a for a, _ in pairs] + [b for _, b in pairs]
+        others = [b for _, b in pairs] + [a for a, _ in pairs]
+
+        types_number = len(ItemType)
+        codes = np.fromiter(
+            (s.item_type.value * types_number + o.item_type.value for s, o in zip(selves, others)),
+            dtype=np.intp,
+            count=2 * n
+        )
+
+        score = np.zeros(2 * n, dtype=np.int64)
+        consumed = np.zeros(2 * n, dtype=bool)
+
+        # codes come sorted, hence in the order of the item types
+        codes_found = np.unique(codes).tolist()
+
+        for code in codes_found:
+            rule = self.__rules[code]
+
+            if rule is None:
+                continue
+
+            idx = np.flatnonzero(codes == code)
+            score[idx], consumed[idx] = rule(
+                [selves[k] for k in idx],
+                [others[k] for k in idx],
+                current_timestamp
+            )
+
+        pair_idx = np.tile(np.arange(n), 2)
+        keys = np.fromiter((id(o) for o in others), dtype=np.int64, count=2 * n)
+
+        # each item is consumed by the first pair consuming it...
+        eating = np.flatnonzero(consumed)
+        eating = eating[np.argsort(pair_idx[eating], kind='stable')]
+
+        eaten_keys, first = np.unique(keys[eating], return_index=True)
+        eaten_at = pair_idx[eating][first]
+
+        # ...and the following pairs with that item have no effect
+        pos = np.minimum(np.searchsorted(eaten_keys, keys), max(len(eaten_keys) - 1, 0))
+        gone = np.zeros(2 * n, dtype=bool)
+
+        if len(eaten_keys):
+            gone = (eaten_keys[pos] == keys) & (eaten_at[pos] < pair_idx)
+
+        cancelled = np.tile(gone[:n] | gone[n:], 2)
+        score[cancelled] = 0
+
+        # scores are summed by item, and each item updated once
+        self_keys = np.fromiter((id(s) for s in selves), dtype=np.int64, count=2 * n)
+        scorers, first_idx, inverse = np.unique(self_keys, return_index=True, return_inverse=True)
+        totals = np.zeros(len(scorers), dtype=np.int64)
+        np.add.at(totals, inverse, score)
+
+        for k in np.flatnonzero(totals).tolist():
+            item = selves[first_idx[k]]
+            item.item_status.score += int(totals[k])
+
+        removed = [others[k] for k in eating[first[np.argsort(eaten_at, kind='stable')]].tolist()]
+
+        for item in removed:
+            item.item_status.removed = True
+
+        for code in codes_found:
+            reaction = self.__reactions[code]
+
+            if reaction is None:
+                continue
+
+            idx = np.flatnonzero((codes == code) & ~cancelled)
+
+            if len(idx):
+                reaction([selves[k] for k in idx], [others[k] for k in idx], current_timestamp)
+
+        return removed
+
+
+COLLISION_TABLE = CollisionTable(
+    rules={
+        ItemType.character: MAIN_CHAR_COLLISION,
+        ItemType.monster: MONSTER_COLLISION
+    },
+    reactions={
+        ItemType.monster: MONSTER_REACTIONS
+    }
+)
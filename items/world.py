@@ -0,0 +1,408 @@
+import json
+import math
+from typing import Dict, List, Optional, Tuple, TypedDict
+
+import numpy as np
+from pygame import Rect
+
+from items import Dynamic, DynamicState
+from items.actions import Action, ActionType, pack_actions, unpack_action
+from items.engine import EngineState, KinematicsEngine
+from items.factory import Provider
+from items.policy import PolicyState, RandomPolicy
+from items.rules import COLLISION_TABLE
+from util import Grid, Item
+from util.pathfinding import PathFinder
+from util.profiler import FrameProfiler
+from util.scheduler import Event, Scheduler, SchedulerState
+
+# time after which consumed items are back on the map
+RESPAWN_MILLIS = 10000
+
+
+class WorldSnapshot(TypedDict):
+    dynamics: List[DynamicState]
+    engine: Optional[EngineState]
+    consumed: Dict[int, Tuple[int, Item]]
+    scheduler: SchedulerState
+    policies: List[PolicyState]
+
+
+# snapshots as plain arrays, referring to items by id
+PackedSnapshot = Dict[str, np.ndarray]
+
+# pending events of packed snapshots
+EVENT_DTYPE = np.dtype([
+    ('due', '<i8'),
+    ('seq', '<i8'),
+    # index of the policy of an expiration, -1 for a respawn
+    ('policy', 'i1'),
+    ('item', '<i8')
+])
+
+
+class World:
+    """
+    The simulation of a map, with no display nor input: monsters act at
+    random (chasing the main character when hunting), while the main
+    character is either driven by the actions given at each step or, with
+    `random_main_char`, acts at random too.
+    """
+
+    def __init__(
+        self,
+        config: str,
+        vectorized: bool = False,
+        seed: Optional[int] = None,
+        random_main_char: bool = False
+    ) -> None:
+        self.__provider = Provider(config)
+        self.__grid = self.__provider.grid
+        self.__area = Rect((0, 0), self.__grid.area)
+
+        self.__main_char = self.__provider.main_character
+
+        self.__consumed: Dict[int, Tuple[int, Item]] = {}
+
+        # respawns and action expirations are events fired at their time,
+        # rather than checked on each tick
+        self.__scheduler = Scheduler()
+
+        # random actions are all drawn from the same (seedable) generator
+        self.__rng = np.random.default_rng(seed)
+        self.__monsters_policy = RandomPolicy(
+            self.monsters,
+            self.__scheduler,
+            linear_speed=75,
+            rng=self.__rng
+        )
+
+        if random_main_char:
+            self.__main_char_policy = RandomPolicy(
+                [self.__main_char],
+                self.__scheduler,
+                linear_speed=100,
+                rng=self.__rng
+            )
+        else:
+            self.__main_char_policy = None
+
+        # With the vectorized engine, all the dynamic items are moved by a
+        # single batched step, rather than one at a time.
+        if vectorized:
+            self.__engine = KinematicsEngine(
+                [self.__main_char, *self.monsters],
+                area=self.__area,
+                grid=self.__grid
+            )
+        else:
+            self.__engine = None
+
+        # hunting monsters head to the main character, along the distance
+        # fields shared by all of them
+        self.__path_finder = PathFinder(self.__grid)
+
+        self.__dynamics = [self.__main_char, *self.monsters]
+        self.__consumables: Dict[int, Item] = {
+            i.id: i for i in self.__provider.interactive_sprites
+        }
+        self.__policies = [
+            p for p in (self.__monsters_policy, self.__main_char_policy) if p is not None
+        ]
+
+    def seed(self, seed: Optional[int] = None):
+        """
+        Seeds the generator of the random actions again, as if the world was
+        created with `seed`.
+        """
+        self.__rng.bit_generator.state = np.random.default_rng(seed).bit_generator.state
+
+    def snapshot(self) -> WorldSnapshot:
+        """
+        The state of the simulation, to get back to with `restore`.
+
+        Only what changes along the simulation is captured, sharing what is
+        never changed in place (images, rects, actions), so that planners
+        can fork the world many times: snapshots can only be restored on the
+        world they were taken from.
+        """
+        return WorldSnapshot(
+            dynamics=[d.get_state() for d in self.__dynamics],
+            engine=None if self.__engine is None else self.__engine.snapshot(),
+            consumed=dict(self.__consumed),
+            scheduler=self.__scheduler.snapshot(),
+            policies=[p.snapshot() for p in self.__policies]
+        )
+
+    def restore(self, snapshot: WorldSnapshot):
+        # consumables are put back or taken away only where they differ
+        for id, (_, i) in self.__consumed.items():
+            if id not in snapshot['consumed']:
+                i.item_status.removed = False
+                self.__provider.interactive_sprites.add(i)
+                self.__grid.insert_item(i)
+
+        for id, (_, i) in snapshot['consumed'].items():
+            if id not in self.__consumed:
+                i.item_status.removed = True
+                self.__grid.remove_item(i)
+                i.kill()
+
+        self.__consumed = dict(snapshot['consumed'])
+
+        if self.__engine is not None:
+            self.__engine.restore(snapshot['engine'])
+
+        for d, state in zip(self.__dynamics, snapshot['dynamics']):
+            d.set_state(state, self.__grid)
+
+        self.__scheduler.restore(snapshot['scheduler'])
+
+        for p, state in zip(self.__policies, snapshot['policies']):
+            p.restore(state)
+
+    def pack(self, snapshot: WorldSnapshot) -> PackedSnapshot:
+        """
+        The snapshot as plain arrays: unlike snapshots, packed ones can be
+        saved, and unpacked on any world of the same map.
+        """
+        dynamics = snapshot['dynamics']
+        policies = snapshot['policies']
+
+        expirations = {
+            e: (k, agent)
+            for k, (_, _, agent_expirations) in enumerate(policies)
+            for agent, e in agent_expirations.items()
+        }
+
+        seq, entries = snapshot['scheduler']
+        events = []
+
+        for due, event_seq, e, cancelled in entries:
+            # skipped anyway when due
+            if cancelled:
+                continue
+
+            if e in expirations:
+                k, agent = expirations[e]
+                events.append((due, event_seq, k, agent.id))
+            elif e.callback == self.__regenerate_interactive:
+                events.append((due, event_seq, -1, e.args[0].id))
+            else:
+                raise ValueError(f'event calling {e.callback} cannot be packed')
+
+        packed = {
+            'positions': np.array([(s[0].x, s[0].y) for s in dynamics], dtype=np.int64),
+            'orientations': np.array([s[1] for s in dynamics], dtype=np.float64),
+            'image_idx': np.array([s[2] for s in dynamics], dtype=np.int64),
+            'actions': pack_actions([s[3] for s in dynamics]),
+            'scores': np.array([s[4] for s in dynamics], dtype=np.int64),
+            'remainders': np.array([s[5] for s in dynamics], dtype=np.float64).reshape(-1, 2),
+            'consumed': np.array(
+                [(id, ts) for id, (ts, _) in snapshot['consumed'].items()],
+                dtype=np.int64
+            ).reshape(-1, 2),
+            'seq': np.array(seq, dtype=np.int64),
+            'events': np.array(events, dtype=EVENT_DTYPE),
+            # generator states hold 128 bits integers
+            'rng': np.array(json.dumps([p[0] for p in policies]))
+        }
+
+        for k, (_, ready, _) in enumerate(policies):
+            packed[f'ready_{k}'] = np.array([a.id for a in ready], dtype=np.int64)
+
+        if snapshot['engine'] is not None:
+            for k, a in enumerate(snapshot['engine']):
+                packed[f'engine_{k}'] = a
+
+        return packed
+
+    def unpack(self, packed: PackedSnapshot) -> WorldSnapshot:
+        dynamics_by_id = {d.id: d for d in self.__dynamics}
+
+        dynamics = [
+            (Rect(x, y, d.rect.width, d.rect.height), alpha, image_idx, unpack_action(a), score, (rx, ry))
+            for d, (x, y), alpha, image_idx, a, score, (rx, ry) in zip(
+                self.__dynamics,
+                packed['positions'].tolist(),
+                packed['orientations'].tolist(),
+                packed['image_idx'].tolist(),
+                packed['actions'],
+                packed['scores'].tolist(),
+                packed['remainders'].tolist()
+            )
+        ]
+
+        expirations: List[Dict[Dynamic, Event]] = [{} for _ in self.__policies]
+        entries = []
+
+        for due, seq, k, id in packed['events'].tolist():
+            if k < 0:
+                event = Event(due, self.__regenerate_interactive, (self.__consumables[id],))
+            else:
+                agent = dynamics_by_id[id]
+                event = self.__policies[k].get_expiration(agent, due)
+                expirations[k][agent] = event
+
+            entries.append((due, seq, event, False))
+
+        # a sorted list is a heap
+        entries.sort(key=lambda entry: entry[:2])
+
+        rng_states = json.loads(str(packed['rng']))
+
+        if self.__engine is None:
+            engine = None
+        else:
+            engine = tuple(packed[f'engine_{k}'] for k in range(len(packed)) if f'engine_{k}' in packed)
+
+        return WorldSnapshot(
+            dynamics=dynamics,
+            engine=engine,
+            consumed={
+                id: (ts, self.__consumables[id]) for id, ts in packed['consumed'].tolist()
+            },
+            scheduler=(int(packed['seq']), entries),
+            policies=[
+                (
+                    rng_states[k],
+                    [dynamics_by_id[id] for id in packed[f'ready_{k}'].tolist()],
+                    expirations[k]
+                )
+                for k in range(len(self.__policies))
+            ]
+        )
+
+    def step(
+        self,
+        dt: float,
+        current_timestamp: int,
+        main_char_action: Optional[Action] = None,
+        profiler: Optional[FrameProfiler] = None
+    ):
+        """
+        Advances the simulation by `dt` seconds, up to the given time. The
+        action of the main character, if given, is started unless its
+        current one still has to expire.
+        """
+        fired = self.__scheduler.run_due(current_timestamp)
+
+        if profiler is not None:
+            profiler.mark('scheduler')
+            profiler.count('scheduled_events', fired)
+
+        if main_char_action is not None:
+            self.__main_char.start_action(
+                main_char_action,
+                current_timestamp=current_timestamp
+            )
+        elif self.__main_char_policy is not None:
+            self.__main_char_policy.act(current_timestamp)
+
+        self.__monsters_policy.act(current_timestamp)
+
+        # hunters are steered before anything moves, so that the vectorized
+        # engine (moving the main character with the monsters) sees the
+        # same targets
+        self.__steer_hunters()
+
+        self.__main_char.act(dt=dt, area=self.__area, grid=self.__grid)
+
+        self.__move_monsters(dt)
+
+        if profiler is not None:
+            profiler.mark('actions')
+
+        pairs = self.__resolve_collisions(current_timestamp)
+
+        if profiler is not None:
+            profiler.mark('collisions')
+            profiler.count('collision_pairs', pairs)
+
+        self.__update_sprites()
+
+        if profiler is not None:
+            profiler.mark('sprites')
+
+    def __update_sprites(self):
+        self.__provider.interactive_sprites.update()
+        self.__provider.main_sprites.update()
+        self.__provider.dynamic_sprites.update()
+        self.__provider.static_sprites.update()
+
+    def __resolve_collisions(self, current_timestamp: int) -> int:
+        dynamics: List[Dynamic] = [
+            *self.__provider.main_sprites,
+            *self.__provider.dynamic_sprites
+        ]
+
+        # All the overlapping pairs are found by a single pass on the grid,
+        # before any rule changes it: the rules are then applied to all of
+        # them at once.
+        pairs = list(self.__grid.iter_overlapping_pairs(
+            dynamics,
+            item_types=lambda d: COLLISION_TABLE.colliding_types(d.item_type)
+        ))
+
+        for i in COLLISION_TABLE.resolve(pairs, current_timestamp):
+            self.__consume(i, current_timestamp)
+
+        return len(pairs)
+
+    def __consume(self, i: Item, current_timestamp: int):
+        self.__grid.remove_item(i)
+        i.kill()
+        self.__consumed[i.id] = (current_timestamp, i)
+
+        # same as waiting for more than the respawn time
+        self.__scheduler.schedule(
+            current_timestamp + RESPAWN_MILLIS + 1,
+            self.__regenerate_interactive,
+            i
+        )
+
+    def __regenerate_interactive(self, i: Item):
+        del self.__consumed[i.id]
+        i.item_status.removed = False
+
+        self.__provider.interactive_sprites.add(i)
+        self.__grid.insert_item(i)
+
+    def __steer_hunters(self):
+        hunters = [m for m in self.monsters if m.action['action_type'] is ActionType.hunt]
+
+        if not hunters:
+            return
+
+        headings = self.__path_finder.get_headings([self.__main_char], [m.rect for m in hunters])
+
+        for hunter, alpha in zip(hunters, headings.tolist()):
+            if not math.isnan(alpha):
+                hunter.set_orientation(alpha)
+
+    def __move_monsters(self, dt: float):
+        if self.__engine is None:
+            for monster in self.monsters:
+                monster.act(dt=dt, area=self.__area, grid=self.__grid)
+        else:
+            self.__engine.step(dt)
+
+    @property
+    def provider(self) -> Provider:
+        return self.__provider
+
+    @property
+    def grid(self) -> Grid:
+        return self.__grid
+
+    @property
+    def area(self) -> Rect:
+        return self.__area
+
+    @property
+    def main_character(self) -> Dynamic:
+        return self.__main_char
+
+    @property
+    def monsters(self) -> List[Dynamic]:
+        return self.__provider.dynamic_sprites.sprites()
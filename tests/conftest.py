@@ -0,0 +1,4 @@
+import os
+
+# worlds are simulated with no display
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
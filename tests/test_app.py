@@ -0,0 +1,25 @@
+import pytest
+
+from app import Game
+from items.replay import ReplayPlayer
+from util.clock import VirtualClock
+
+STEP_MILLIS = 40
+
+
+@pytest.mark.parametrize('start_millis', [0, 10000])
+def test_duration_counts_from_start_of_run(tmp_path, start_millis):
+    path = str(tmp_path / 'replay.npz')
+    game = Game(
+        (640, 480),
+        (150, 250),
+        'config.yaml',
+        headless=True,
+        clock=VirtualClock(STEP_MILLIS, start_millis),
+        seed=3,
+        record=path
+    )
+
+    game.run(duration_millis=100 * STEP_MILLIS)
+
+    assert ReplayPlayer(path).ticks == 100
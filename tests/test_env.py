@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+from env import WorldEnv
+from env.vector import VectorEnv
+
+
+def run_episode(env, seed, actions):
+    observations = [env.reset(seed)]
+    rewards = []
+
+    for action in actions:
+        observation, reward, _ = env.step(int(action))
+        observations.append(observation)
+        rewards.append(reward)
+
+    return observations, rewards
+
+
+def test_reset_starts_same_episode_as_new_env():
+    actions = np.random.default_rng(3).integers(6, size=500)
+
+    env = WorldEnv('config.yaml')
+    run_episode(env, 5, actions)
+    observations, rewards = run_episode(env, 9, actions)
+
+    expected_observations, expected_rewards = run_episode(WorldEnv('config.yaml'), 9, actions)
+
+    assert rewards == expected_rewards
+    assert all(np.array_equal(o, e) for o, e in zip(observations, expected_observations))
+
+
+def test_failing_world_is_reported():
+    with VectorEnv('missing.yaml', worlds=2) as env:
+        with pytest.raises(RuntimeError, match='world 0 failed'):
+            env.reset(0)
@@ -0,0 +1,109 @@
+import random
+
+import pytest
+from pygame import Rect
+
+from util import Grid, ItemType
+
+CELL = 20
+SIZE = (40, 30)
+AREA = Rect(0, 0, CELL * SIZE[0], CELL * SIZE[1])
+
+
+class FakeItem:
+    def __init__(self, id, item_type, rect):
+        self.id = id
+        self.item_type = item_type
+        self.rect = rect
+
+
+def get_items(rnd, n):
+    items = []
+
+    for id in range(n):
+        w, h = rnd.randint(5, 50), rnd.randint(5, 50)
+        rect = Rect(rnd.randrange(AREA.w - w), rnd.randrange(AREA.h - h), w, h)
+        items.append(FakeItem(id, rnd.choice(list(ItemType)), rect))
+
+    return items
+
+
+def get_ids(grid, rect, item_types=None):
+    return sorted(i.id for i in grid.iter_items_in_area(rect, item_types))
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_chunked_grid_answers_as_dense_one(seed):
+    rnd = random.Random(seed)
+    dense = Grid((CELL, CELL), SIZE)
+    chunked = Grid((CELL, CELL), SIZE, chunk_size=4)
+
+    items = get_items(rnd, 60)
+
+    for grid in (dense, chunked):
+        grid.insert_items(*items)
+
+    for _ in range(200):
+        item = rnd.choice(items)
+        old_rect = item.rect
+        item.rect = old_rect.move(rnd.randint(-60, 60), rnd.randint(-60, 60)).clamp(AREA)
+
+        for grid in (dense, chunked):
+            grid.move_item(item, old_rect, item.rect)
+
+        area = Rect(rnd.randrange(AREA.w), rnd.randrange(AREA.h), 150, 100).clip(AREA)
+        item_types = rnd.choice([None, ItemType.monster, (ItemType.bonus, ItemType.wall)])
+
+        assert get_ids(chunked, area, item_types) == get_ids(dense, area, item_types)
+
+
+def test_chunked_grid_frees_empty_cells():
+    rnd = random.Random(0)
+    grid = Grid((CELL, CELL), SIZE, chunk_size=4)
+    items = get_items(rnd, 30)
+
+    grid.insert_items(*items)
+
+    # only the cells of the items are allocated (up to the one of their
+    # bottom right corner)
+    covered = {
+        (i, j)
+        for item in items
+        for i in range(item.rect.left // CELL, item.rect.right // CELL + 1)
+        for j in range(item.rect.top // CELL, item.rect.bottom // CELL + 1)
+    }
+    assert grid.allocated_cells == len(covered)
+
+    for item in items:
+        grid.remove_item(item)
+
+    assert grid.allocated_cells == 0
+
+
+@pytest.mark.parametrize('chunk_size', [None, 4])
+@pytest.mark.parametrize('seed', range(10))
+def test_overlapping_pairs_match_brute_force(seed, chunk_size):
+    rnd = random.Random(seed)
+    grid = Grid((CELL, CELL), SIZE, chunk_size=chunk_size)
+    items = get_items(rnd, 150)
+    grid.insert_items(*items)
+
+    # dynamic items look for the types they have rules for
+    colliding_types = {
+        ItemType.character: (ItemType.bonus, ItemType.malus, ItemType.monster),
+        ItemType.monster: (ItemType.bonus, ItemType.character)
+    }
+    dynamics = [i for i in items if i.item_type in colliding_types]
+
+    pairs = list(grid.iter_overlapping_pairs(dynamics, lambda i: colliding_types[i.item_type]))
+
+    expected = {
+        frozenset((a.id, b.id))
+        for a in dynamics
+        for b in items
+        if b is not a and b.item_type in colliding_types[a.item_type] and a.rect.colliderect(b.rect)
+    }
+
+    # each pair is found once
+    assert len(pairs) == len(expected)
+    assert {frozenset((a.id, b.id)) for a, b in pairs} == expected
@@ -0,0 +1,26 @@
+import numpy as np
+import pytest
+
+from items import maps
+from items.maps import compile_map, load_map, parse_map
+
+
+def test_compiled_map_loads_as_parsed(tmp_path):
+    loaded = load_map(compile_map('config.yaml', str(tmp_path)))
+    parsed = parse_map('config.yaml')
+
+    assert loaded['cell_size'] == parsed['cell_size']
+    assert loaded['grid_size'] == parsed['grid_size']
+    assert np.array_equal(loaded['tiles'], parsed['tiles'])
+    assert np.array_equal(loaded['spawns'], parsed['spawns'])
+
+
+def test_format_change_is_not_loaded_from_cache(tmp_path, monkeypatch):
+    path = compile_map('config.yaml', str(tmp_path))
+
+    monkeypatch.setattr(maps, 'MAP_FORMAT_VERSION', maps.MAP_FORMAT_VERSION + 1)
+
+    assert compile_map('config.yaml', str(tmp_path)) != path
+
+    with pytest.raises(ValueError):
+        load_map(path)
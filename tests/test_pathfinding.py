@@ -0,0 +1,98 @@
+import math
+import tracemalloc
+
+import numpy as np
+from pygame import Rect, Surface
+
+from items import Static
+from util import Grid, ItemType
+from util.pathfinding import PathFinder
+
+CELL = 20
+
+
+def get_grid(gaps):
+    """
+    A 20x20 map cut in half by a wall along the row 10, open at the columns
+    in `gaps`.
+    """
+    grid = Grid((CELL, CELL), (20, 20))
+
+    mask = np.zeros((20, 20), dtype=bool)
+    mask[:, 10] = True
+    mask[list(gaps), 10] = False
+
+    grid.walls.add_tiles(mask)
+
+    return grid
+
+
+def get_finder(gaps):
+    return PathFinder(get_grid(gaps))
+
+
+def get_target(i, j):
+    return Static(1, ItemType.character, i * CELL + CELL // 2, j * CELL + CELL // 2, Surface((20, 20)))
+
+
+def get_heading(finder, x, y, size=32):
+    return finder.get_headings([get_target(10, 15)], [Rect(x, y, size, size)])[0]
+
+
+def test_fitting_hunter_goes_through_gap():
+    # aligned on the cells, a 32 pixels hunter covers two columns
+    heading = get_heading(get_finder(gaps=(0, 1, 2, 9, 10)), 9 * CELL, 5 * CELL)
+
+    assert math.sin(heading) < 0 and abs(math.cos(heading)) < 0.5
+
+
+def test_hunter_is_routed_around_narrow_gap():
+    # between cells, the same hunter covers three columns: it can't get in
+    # the gap of two and heads to the wider one
+    heading = get_heading(get_finder(gaps=(0, 1, 2, 9, 10)), 9 * CELL + 10, 5 * CELL)
+
+    assert math.cos(heading) < -0.5
+
+
+def test_hunter_too_large_for_any_gap_is_not_steered():
+    finder = get_finder(gaps=(9, 10))
+
+    assert np.isnan(get_heading(finder, 5 * CELL, 5 * CELL, size=50))
+
+
+def test_arrived_hunter_heads_to_target():
+    heading = get_heading(get_finder(gaps=(9, 10)), 12 * CELL, 15 * CELL, size=20)
+
+    assert math.isclose(heading, math.pi)
+
+
+def test_walls_added_later_are_seen():
+    grid = get_grid(gaps=(0, 1, 2, 9, 10))
+    finder = PathFinder(grid)
+    get_heading(finder, 9 * CELL, 5 * CELL)
+
+    # the gap the hunter was heading to gets closed: moving the target
+    # computes the field again
+    mask = np.zeros((20, 20), dtype=bool)
+    mask[9:11, 10] = True
+    grid.walls.add_tiles(mask)
+
+    heading = finder.get_headings([get_target(11, 15)], [Rect(9 * CELL, 5 * CELL, 32, 32)])[0]
+
+    assert math.cos(heading) < -0.5
+
+
+def test_memory_does_not_grow_with_map():
+    grid = Grid((CELL, CELL), (10000, 10000), chunk_size=64)
+
+    tracemalloc.start()
+
+    try:
+        finder = PathFinder(grid)
+        heading = finder.get_headings([get_target(5000, 5000)], [Rect(4990 * CELL, 5000 * CELL, 32, 32)])[0]
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    assert math.isclose(heading, 0, abs_tol=0.1)
+    assert peak < 10 * 2 ** 20
@@ -0,0 +1,61 @@
+import pygame as pg
+
+from items.factory import Provider
+from view.renderer import Renderer
+
+
+def get_pixels(surface):
+    return pg.image.tostring(surface, 'RGB')
+
+
+def test_scrolled_window_matches_fresh_drawing():
+    provider = Provider('config.yaml')
+    renderer = Renderer(provider, (200, 150))
+
+    # from outside of the game area to its middle, a few pixels at a time
+    # and then by a jump
+    for origin in ((-50, -40), (-30, -35), (0, 0), (7, 3), (400, 300)):
+        renderer.draw(origin)
+
+        fresh = Renderer(provider, (200, 150))
+        fresh.draw(origin)
+
+        assert get_pixels(renderer.surface) == get_pixels(fresh.surface)
+
+
+def test_unchanged_window_is_not_drawn_again():
+    renderer = Renderer(Provider('config.yaml'), (200, 150))
+
+    assert pg.Rect(0, 0, 200, 150) in renderer.draw((10, 10))
+    assert renderer.draw((10, 10)) == []
+
+
+def assert_black_outside(renderer, origin, area):
+    window = pg.Rect(origin, renderer.surface.get_size())
+
+    for y in range(window.top, window.bottom, 4):
+        for x in range(window.left, window.right, 4):
+            if not area.collidepoint(x, y):
+                assert renderer.surface.get_at((x - window.x, y - window.y))[:3] == (0, 0, 0)
+
+
+def test_window_past_the_right_and_bottom_edges():
+    provider = Provider('config.yaml')
+    area = provider.area
+
+    for origin in ((area.right - 100, area.bottom - 50), (area.right + 10, area.bottom + 10)):
+        renderer = Renderer(provider, (296, 296))
+        renderer.draw(origin)
+
+        assert_black_outside(renderer, origin, area)
+
+
+def test_window_before_the_top_and_left_edges():
+    provider = Provider('config.yaml')
+    area = provider.area
+
+    for origin in ((-150, -100), (-400, -400)):
+        renderer = Renderer(provider, (296, 296))
+        renderer.draw(origin)
+
+        assert_black_outside(renderer, origin, area)
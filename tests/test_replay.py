@@ -0,0 +1,89 @@
+import random
+
+import pytest
+
+from app import Game
+from items.actions import get_keyboard_catalog
+from items.replay import ReplayPlayer, ReplayRecorder
+from items.world import World
+from tests.test_world import STEP_MILLIS, get_state
+
+TICKS = 600
+
+
+@pytest.fixture(params=[False, True], ids=['scalar', 'vectorized'])
+def recording(request, tmp_path):
+    """
+    A recorded run, with the states of the world before some of its ticks.
+    """
+    vectorized = request.param
+    path = str(tmp_path / 'replay.npz')
+    catalog = get_keyboard_catalog()
+
+    world = World('config.yaml', vectorized=vectorized, seed=3)
+    recorder = ReplayRecorder(path, 'config.yaml', 3, vectorized=vectorized, keyframe_ticks=100)
+    rnd = random.Random(0)
+    states = {}
+
+    for tick in range(TICKS):
+        if tick % 50 == 0:
+            states[tick] = get_state(world)
+
+        timestamp = tick * STEP_MILLIS
+
+        # some ticks are left to the policy of the main character
+        if rnd.random() < 0.8:
+            action = {**catalog[rnd.randrange(len(catalog))], 'start_timestamp': timestamp}
+        else:
+            action = None
+
+        recorder.record(world, STEP_MILLIS, timestamp, action)
+        world.step(STEP_MILLIS / 1000, timestamp, action)
+
+    recorder.save()
+    states[TICKS] = get_state(world)
+
+    return path, states
+
+
+def test_playback_reproduces_recorded_run(recording):
+    path, states = recording
+    player = ReplayPlayer(path)
+
+    player.play()
+
+    assert player.tick == TICKS
+    assert get_state(player.world) == states[TICKS]
+
+
+def test_seek_reproduces_recorded_states(recording):
+    path, states = recording
+    player = ReplayPlayer(path)
+
+    # forward past keyframes, back to one, between two and then to the end
+    for tick in (450, 100, 250, 50, TICKS):
+        player.seek(tick)
+
+        assert player.tick == tick
+        assert get_state(player.world) == states[tick]
+
+
+def test_recording_is_saved_when_session_fails(tmp_path, monkeypatch):
+    path = str(tmp_path / 'replay.npz')
+    game = Game((640, 480), (150, 250), 'config.yaml', headless=True, seed=3, record=path)
+    step = World.step
+
+    def failing_step(world, dt, current_timestamp, *args):
+        if current_timestamp >= 100 * STEP_MILLIS:
+            raise RuntimeError('failing step')
+
+        step(world, dt, current_timestamp, *args)
+
+    monkeypatch.setattr(World, 'step', failing_step)
+
+    with pytest.raises(RuntimeError, match='failing step'):
+        game.run(duration_millis=200 * STEP_MILLIS)
+
+    player = ReplayPlayer(path)
+
+    assert player.ticks == 100
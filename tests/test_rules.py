@@ -0,0 +1,132 @@
+import random
+
+import pytest
+
+from items.actions import ActionType
+from items.rules import COLLISION_TABLE, CollisionTable
+from util import ItemStatus, ItemType
+
+
+class FakeItem:
+    def __init__(self, item_type, value=0, action_type=None):
+        self.item_type = item_type
+        self.item_status = ItemStatus(value=value)
+        self.action = {'action_type': action_type, 'start_timestamp': 0, 'duration_millis': 500}
+
+    def start_action(self, a, current_timestamp, force=False):
+        self.action = a
+
+
+def resolve_pair_by_pair(pairs, current_timestamp):
+    """
+    The collision rules applied to each pair in turn, the character first.
+    """
+    removed = []
+
+    for a, b in pairs:
+        if a.item_status.removed or b.item_status.removed:
+            continue
+
+        if b.item_type is ItemType.character:
+            a, b = b, a
+
+        if a.item_type is ItemType.character:
+            picking = a.action['action_type'] is ActionType.pick
+
+            if b.item_type in (ItemType.bonus, ItemType.malus) and picking:
+                sign = 1 if b.item_type is ItemType.bonus else -1
+                a.item_status.score += sign * b.item_status.value
+                b.item_status.removed = True
+                removed.append(b)
+
+            elif b.item_type is ItemType.monster and b.action['action_type'] is ActionType.hunt:
+                a.item_status.score -= b.item_status.value
+                b.start_action(
+                    {
+                        **b.action,
+                        'action_type': ActionType.move,
+                        'start_timestamp': current_timestamp,
+                        'duration_millis': 1000
+                    },
+                    current_timestamp
+                )
+
+        else:
+            if b.item_type is ItemType.monster:
+                a, b = b, a
+
+            if a.item_type is ItemType.monster and b.item_type in (ItemType.bonus, ItemType.malus):
+                b.item_status.removed = True
+                removed.append(b)
+
+    return removed
+
+
+def get_items(rnd):
+    character = FakeItem(
+        ItemType.character,
+        action_type=rnd.choice([ActionType.pick, ActionType.move])
+    )
+    monsters = [
+        FakeItem(
+            ItemType.monster,
+            value=rnd.randint(1, 9),
+            action_type=rnd.choice([ActionType.hunt, ActionType.move])
+        ) for _ in range(3)
+    ]
+    consumables = [
+        FakeItem(rnd.choice([ItemType.bonus, ItemType.malus]), value=rnd.randint(1, 9))
+        for _ in range(6)
+    ]
+
+    return [character, *monsters, *consumables]
+
+
+@pytest.mark.parametrize('seed', range(50))
+def test_resolve_matches_pair_by_pair(seed):
+    rnd = random.Random(seed)
+    items = get_items(rnd)
+    expected_items = get_items(random.Random(seed))
+
+    all_pairs = [(i, j) for i in range(len(items)) for j in range(i + 1, len(items))]
+    pairs = [
+        p if rnd.random() < 0.5 else p[::-1]
+        for p in rnd.sample(all_pairs, rnd.randint(0, 20))
+    ]
+
+    removed = COLLISION_TABLE.resolve([(items[i], items[j]) for i, j in pairs], 100)
+    expected = resolve_pair_by_pair(
+        [(expected_items[i], expected_items[j]) for i, j in pairs],
+        100
+    )
+
+    assert [items.index(i) for i in removed] == [expected_items.index(i) for i in expected]
+
+    for item, expected_item in zip(items, expected_items):
+        assert item.item_status.score == expected_item.item_status.score
+        assert item.item_status.removed == expected_item.item_status.removed
+        assert item.action == expected_item.action
+
+
+def test_reactions_skip_pairs_of_consumed_items():
+    reacted = []
+
+    def eat(selves, items, _):
+        return [0] * len(items), [True] * len(items)
+
+    def react(selves, items, _):
+        reacted.extend(zip(selves, items))
+
+    table = CollisionTable(
+        rules={ItemType.monster: {ItemType.bonus: eat}},
+        reactions={ItemType.character: {ItemType.bonus: react}}
+    )
+
+    character, monster = FakeItem(ItemType.character), FakeItem(ItemType.monster)
+    eaten, left = FakeItem(ItemType.bonus), FakeItem(ItemType.bonus)
+
+    removed = table.resolve([(monster, eaten), (character, eaten), (left, character)], 0)
+
+    assert removed == [eaten]
+    assert reacted == [(character, left)]
+    assert table.colliding_types(ItemType.character) == (ItemType.bonus,)
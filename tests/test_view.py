@@ -0,0 +1,158 @@
+import math
+
+import numpy as np
+import pygame as pg
+from pygame import Rect, Surface
+
+from items import Dynamic, Static
+from items.factory import Provider
+from util import Grid, ItemType
+from view import CharacterView
+from view.observation import CHANNELS, VALUE_CHANNEL, GridObserver
+
+WIDTH, HEIGHT = 150, 250
+
+CELL = 20
+
+
+class FakeCharacter:
+    def __init__(self, orientation_rad):
+        self.orientation_rad = orientation_rad
+
+
+def get_surface():
+    surface = Surface((800, 800), 0, 32)
+    pixels = np.random.default_rng(0).integers(0, 2 ** 24, size=(800, 800), dtype=np.uint32)
+    pg.surfarray.blit_array(surface, pixels)
+
+    return surface, pg.surfarray.array2d(surface)
+
+
+def get_view(view, surface, orientation_rad, rect):
+    return pg.surfarray.array2d(view.get_view(surface, FakeCharacter(orientation_rad), rect))
+
+
+def test_view_facing_up_is_crop_above_character():
+    surface, pixels = get_surface()
+    rect = Rect(384, 384, 32, 32)
+    cx, cy = rect.center
+
+    view = get_view(CharacterView(WIDTH, HEIGHT), surface, math.pi / 2, rect)
+
+    # the character is at the bottom of the view, horizontally centered
+    top = cy + rect.height - HEIGHT
+    expected = pixels[cx - WIDTH // 2:cx + WIDTH // 2, top:top + HEIGHT]
+
+    assert np.array_equal(view, expected)
+
+
+def test_view_facing_right_is_rotated_crop():
+    surface, pixels = get_surface()
+    rect = Rect(384, 384, 32, 32)
+    cx, cy = rect.center
+
+    view = get_view(CharacterView(WIDTH, HEIGHT), surface, 0, rect)
+
+    # what is on the right of the character is shown up, turned a quarter
+    left = cx - rect.height
+    crop = pixels[left:left + HEIGHT, cy - WIDTH // 2:cy + WIDTH // 2]
+
+    assert np.array_equal(view, crop[::-1].T)
+
+
+def test_cached_lookup_gives_same_view():
+    surface, _ = get_surface()
+    view = CharacterView(WIDTH, HEIGHT)
+    rect = Rect(380, 390, 32, 32)
+
+    first = get_view(view, surface, 1.0, rect)
+    get_view(view, surface, 2.5, rect.move(3, -7))
+
+    assert np.array_equal(get_view(view, surface, 1.0, rect), first)
+    assert np.array_equal(get_view(CharacterView(WIDTH, HEIGHT), surface, 1.0, rect), first)
+
+
+def test_source_rect_encloses_view():
+    surface, _ = get_surface()
+    view = CharacterView(WIDTH, HEIGHT)
+    rect = Rect(380, 390, 32, 32)
+
+    for orientation_rad in np.linspace(0, 2 * math.pi, 37):
+        source = view.get_source_rect(FakeCharacter(orientation_rad), rect)
+
+        # pixels outside of the source rect don't change the view
+        masked = surface.copy()
+        masked.fill((0, 0, 0))
+        masked.blit(surface, source, area=source)
+
+        assert np.array_equal(
+            get_view(view, masked, orientation_rad, rect),
+            get_view(view, surface, orientation_rad, rect)
+        )
+        assert source.width <= view.source_size[0] and source.height <= view.source_size[1]
+
+
+def get_observation(alpha, cell=(10, 10)):
+    """
+    Observation, 5 cells wide and 4 high, of an agent in the middle of the
+    given cell of a 20x20 map, with a wall tile at the cell (12, 8), a bonus
+    at (9, 10) and a malus at (11, 11).
+    """
+    grid = Grid((CELL, CELL), (20, 20))
+
+    mask = np.zeros((20, 20), dtype=bool)
+    mask[12, 8] = True
+    grid.walls.add_tiles(mask)
+
+    def get_center(i, j):
+        return i * CELL + CELL // 2, j * CELL + CELL // 2
+
+    grid.insert_items(
+        Static(1, ItemType.bonus, *get_center(9, 10), Surface((10, 10)), value=10),
+        Static(2, ItemType.malus, *get_center(11, 11), Surface((10, 10)), value=5)
+    )
+
+    agent = Dynamic(3, ItemType.character, *get_center(*cell), Provider('config.yaml').main_character.frames)
+    agent.set_orientation(alpha)
+    grid.insert_item(agent)
+
+    observation = GridObserver(grid, 5, 4).observe([agent])
+
+    assert observation.shape == (1, CHANNELS, 4, 5)
+
+    return observation[0]
+
+
+def get_cells(observation, channel):
+    return {(int(r), int(c)) for r, c in zip(*np.nonzero(observation[channel]))}
+
+
+def test_observation_facing_up():
+    # rows go forward from the bottom one, where the agent is in the
+    # middle, columns go right
+    observation = get_observation(math.pi / 2)
+
+    assert get_cells(observation, ItemType.wall.value) == {(1, 4)}
+    assert get_cells(observation, ItemType.bonus.value) == {(3, 1)}
+    assert get_cells(observation, ItemType.malus.value) == set()
+    assert observation[VALUE_CHANNEL, 3, 1] == 10
+
+    # the agent does not see itself
+    assert get_cells(observation, ItemType.character.value) == set()
+
+
+def test_observation_facing_right():
+    # forward is along x, right along y: the bonus is behind
+    observation = get_observation(0)
+
+    assert get_cells(observation, ItemType.wall.value) == {(1, 0)}
+    assert get_cells(observation, ItemType.bonus.value) == set()
+    assert get_cells(observation, ItemType.malus.value) == {(2, 3)}
+    assert observation[VALUE_CHANNEL, 2, 3] == -5
+
+
+def test_observation_outside_map_is_walls():
+    # facing up from the row 1, the two farthest rows are above the map
+    observation = get_observation(math.pi / 2, cell=(3, 1))
+
+    assert get_cells(observation, ItemType.wall.value) == {(r, c) for r in range(2) for c in range(5)}
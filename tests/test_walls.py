@@ -0,0 +1,117 @@
+import random
+
+import numpy as np
+import pytest
+from pygame import Rect
+
+from util import WallLayer
+
+
+def get_offset(d, n, k):
+    return (2 * d * k + n) // (2 * n)
+
+
+def sweep_pixel_by_pixel(walls, bounds, rect, dx, dy):
+    n = max(abs(dx), abs(dy))
+
+    if n == 0:
+        return 0, 0, 1.0
+
+    for k in range(1, n + 1):
+        moved = rect.move(get_offset(dx, n, k), get_offset(dy, n, k))
+
+        if not bounds.contains(moved) or walls.is_blocked(moved):
+            return get_offset(dx, n, k - 1), get_offset(dy, n, k - 1), (k - 1) / n
+
+    return dx, dy, 1.0
+
+
+def slide_pixel_by_pixel(walls, bounds, rect, dx, dy):
+    ox, oy, toi = sweep_pixel_by_pixel(walls, bounds, rect, dx, dy)
+
+    if toi < 1:
+        ox += sweep_pixel_by_pixel(walls, bounds, rect.move(ox, oy), dx - ox, 0)[0]
+        oy += sweep_pixel_by_pixel(walls, bounds, rect.move(ox, oy), 0, dy - oy)[1]
+
+    return ox, oy
+
+
+def get_moves(seed):
+    """
+    Walls of a random layer, with moves of free rects in it.
+    """
+    rnd = random.Random(seed)
+
+    cw, ch = rnd.choice([(20, 20), (16, 24), (10, 10)])
+    size = (12, 10)
+    walls = WallLayer((cw, ch), size, chunk_size=rnd.choice([None, 4]))
+    bounds = Rect(0, 0, cw * size[0], ch * size[1])
+
+    for _ in range(rnd.randint(0, 15)):
+        if rnd.random() < 0.5:
+            # walls covering whole cells...
+            i, j = rnd.randrange(size[0]), rnd.randrange(size[1])
+            walls.add(Rect(i * cw, j * ch, cw, ch))
+        else:
+            # ...or only parts of them
+            x, y = rnd.randrange(bounds.w), rnd.randrange(bounds.h)
+            walls.add(Rect(x, y, rnd.randint(3, 45), rnd.randint(3, 45)))
+
+    moves = []
+
+    while len(moves) < 100:
+        w, h = rnd.randint(4, 40), rnd.randint(4, 40)
+        rect = Rect(rnd.randrange(bounds.w - w + 1), rnd.randrange(bounds.h - h + 1), w, h)
+
+        if walls.is_blocked(rect):
+            continue
+
+        dx, dy = rnd.randint(-120, 120), rnd.randint(-120, 120)
+
+        if rnd.random() < 0.2:
+            dy = 0
+
+        moves.append((rect, dx, dy))
+
+    return walls, bounds, moves
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_sweep_matches_pixel_by_pixel(seed):
+    walls, bounds, moves = get_moves(seed)
+
+    for rect, dx, dy in moves:
+        expected = sweep_pixel_by_pixel(walls, bounds, rect, dx, dy)
+
+        assert walls.sweep(rect, dx, dy, bounds) == expected
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_slide_matches_pixel_by_pixel(seed):
+    walls, bounds, moves = get_moves(seed)
+
+    for rect, dx, dy in moves:
+        expected = slide_pixel_by_pixel(walls, bounds, rect, dx, dy)
+
+        assert walls.slide(rect, dx, dy, bounds) == expected
+
+
+def test_slide_goes_along_wall():
+    walls = WallLayer((20, 20), (10, 10))
+    walls.add(Rect(0, 100, 200, 20))
+
+    # blocked downward, the rest of the move is done sideways
+    assert walls.slide(Rect(20, 60, 20, 20), 30, 40, Rect(0, 0, 200, 200)) == (30, 20)
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_states_looked_up_match_region(seed):
+    walls, _, _ = get_moves(seed)
+    size = walls.size
+    region = walls.region(0, 0, size[0] - 1, size[1] - 1)
+
+    rnd = np.random.default_rng(seed)
+    i = rnd.integers(size[0], size=(3, 50))
+    j = rnd.integers(size[1], size=(3, 50))
+
+    assert np.array_equal(walls.get_states(i, j), region[i, j])
@@ -0,0 +1,158 @@
+import math
+import tracemalloc
+
+import pytest
+from pygame import Rect
+
+from items import Dynamic
+from items.actions import Action, ActionType
+from items.engine import KinematicsEngine
+from items.factory import Provider
+from items.world import World
+from util import Grid, ItemType
+
+STEP_MILLIS = 40
+
+
+def get_state(world):
+    """
+    Everything the simulation changes, in a comparable form.
+    """
+    provider = world.provider
+    dynamics = [
+        (tuple(d.rect), d.orientation_rad, d.image_idx, d.action, d.item_status.score, d.remainder)
+        for d in [provider.main_character, *provider.dynamic_sprites]
+    ]
+
+    return dynamics, sorted(tuple(i.rect) for i in provider.interactive_sprites)
+
+
+def run(world, steps, timestamp):
+    for _ in range(steps):
+        world.step(STEP_MILLIS / 1000, timestamp)
+        timestamp += STEP_MILLIS
+
+    return timestamp
+
+
+@pytest.mark.parametrize('vectorized', [False, True])
+def test_restored_world_follows_same_trajectory(vectorized):
+    world = World('config.yaml', vectorized=vectorized, seed=3, random_main_char=True)
+
+    timestamp = run(world, 300, 0)
+    snapshot = world.snapshot()
+    state = get_state(world)
+
+    run(world, 400, timestamp)
+    final_state = get_state(world)
+
+    world.restore(snapshot)
+    assert get_state(world) == state
+
+    run(world, 400, timestamp)
+    assert get_state(world) == final_state
+
+
+@pytest.mark.parametrize('vectorized', [False, True])
+def test_unpacked_snapshot_restores_other_world(vectorized):
+    world = World('config.yaml', vectorized=vectorized, seed=5, random_main_char=True)
+    timestamp = run(world, 300, 0)
+    packed = world.pack(world.snapshot())
+
+    other = World('config.yaml', vectorized=vectorized, seed=0, random_main_char=True)
+    other.restore(other.unpack(packed))
+    assert get_state(other) == get_state(world)
+
+    run(world, 400, timestamp)
+    run(other, 400, timestamp)
+    assert get_state(other) == get_state(world)
+
+
+def test_vectorized_engine_matches_scalar_moves():
+    scalar = World('config.yaml', seed=1, random_main_char=True)
+    vectorized = World('config.yaml', vectorized=True, seed=1, random_main_char=True)
+
+    timestamp = 0
+
+    # checked along the way, so that a difference is reported where it starts
+    for _ in range(30):
+        run(scalar, 100, timestamp)
+        timestamp = run(vectorized, 100, timestamp)
+
+        assert get_state(vectorized) == get_state(scalar)
+
+
+def move_for(seconds, sim_hz, speed, alpha, vectorized):
+    """
+    Position reached by an item moving in an empty grid for `seconds`, with
+    steps of 1 / `sim_hz` seconds.
+    """
+    frames = Provider('config.yaml').main_character.frames
+
+    grid = Grid((20, 20), (100, 100))
+    area = Rect((0, 0), grid.area)
+
+    item = Dynamic(0, ItemType.character, 1000, 1000, frames)
+    item.set_orientation(alpha)
+    grid.insert_item(item)
+
+    engine = KinematicsEngine([item], area, grid) if vectorized else None
+
+    item.start_action(
+        Action(action_type=ActionType.move, params=dict(linear_speed=speed)),
+        current_timestamp=0,
+        force=True
+    )
+
+    for _ in range(round(seconds * sim_hz)):
+        if engine is None:
+            item.act(1 / sim_hz, area, grid)
+        else:
+            engine.step(1 / sim_hz)
+
+    return item.rect.x, item.rect.y
+
+
+@pytest.mark.parametrize('vectorized', [False, True])
+@pytest.mark.parametrize('speed, alpha', [(75, 0), (75, math.pi / 2), (100, 0.4), (100, 3.6)])
+def test_speed_does_not_depend_on_sim_hz(vectorized, speed, alpha):
+    x0, y0 = move_for(0, 25, speed, alpha, vectorized)
+    expected = (speed * 4 * math.cos(alpha), - speed * 4 * math.sin(alpha))
+
+    for sim_hz in (25, 50, 60, 100, 200):
+        x, y = move_for(4, sim_hz, speed, alpha, vectorized)
+
+        assert abs(x - x0 - expected[0]) <= 1
+        assert abs(y - y0 - expected[1]) <= 1
+
+
+def test_engine_memory_does_not_grow_with_map():
+    frames = Provider('config.yaml').main_character.frames
+
+    grid = Grid((20, 20), (10000, 10000), chunk_size=64)
+    area = Rect((0, 0), grid.area)
+
+    items = [Dynamic(k, ItemType.monster, 1000 + k * 5000, 1000 + k * 3000, frames) for k in range(20)]
+    grid.insert_items(*items)
+    ys = [item.rect.y for item in items]
+
+    tracemalloc.start()
+
+    try:
+        engine = KinematicsEngine(items, area, grid)
+
+        for item in items:
+            item.start_action(
+                Action(action_type=ActionType.move, params=dict(linear_speed=100)),
+                current_timestamp=0,
+                force=True
+            )
+
+        engine.step(STEP_MILLIS / 1000)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    # facing down, all of them moved
+    assert all(item.rect.y > y for item, y in zip(items, ys))
+    assert peak < 10 * 2 ** 20
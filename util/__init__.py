@@ -1,6 +1,8 @@
 from enum import Enum
-from typing import Dict, List, TypedDict, Tuple
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
 
+import numpy as np
+import pygame as pg
 from pygame import Rect, Surface
 from pygame.sprite import Sprite
 
@@ -13,15 +15,39 @@ class ItemType(Enum):
     malus = 4
 
 
-class ItemStatus(TypedDict, total=False):
-    score: int
-    value: int
-    removed: bool
+def load_image(path: str) -> Surface:
+    image = pg.image.load(path)
+
+    # Pixel format conversion requires a display mode, which is not set in
+    # headless runs: the image is then kept in its original format.
+    if pg.display.get_surface() is None:
+        return image
+
+    return image.convert_alpha()
+
+
+class ItemStatus:
+    """
+    Status of an item, packed in fixed fields: `score` is meaningful for
+    dynamic items, `value` for consumables and monsters.
+    """
+    __slots__ = ('score', 'value', 'removed')
+
+    def __init__(self, score: int = 0, value: int = 0, removed: bool = False) -> None:
+        self.score = score
+        self.value = value
+        self.removed = removed
 
 
 class Item(Sprite):
+    __slots__ = ()
+
     @property
     def rect(self) -> Rect:
+        """
+        The rect of the item, not copied: it must not be modified. It's
+        replaced, not changed, when the item moves.
+        """
         raise NotImplementedError(
             '"rect" property must be implemented in subclasses')
 
@@ -31,7 +57,7 @@ class Item(Sprite):
             '"image" property must be implemented in subclasses')
 
     @property
-    def id(self) -> str:
+    def id(self) -> int:
         raise NotImplementedError(
             '"id" property must be implemented in subclasses')
 
@@ -51,17 +77,503 @@ class Item(Sprite):
             '"item_status" property must be implemented in subclasses')
 
 
+Cell = Dict[ItemType, Dict[int, Item]]
+
+
+class DenseCells:
+    """
+    Cell storage backed by a list of lists, with a cell for each position.
+    """
+
+    def __init__(self, size: Tuple[int, int]) -> None:
+        self.__cells: List[List[Cell]] = [[{} for _ in range(size[1])] for _ in range(size[0])]
+
+    def get(self, i: int, j: int) -> Optional[Cell]:
+        return self.__cells[i][j]
+
+    def get_or_create(self, i: int, j: int) -> Cell:
+        return self.__cells[i][j]
+
+    def release(self, i: int, j: int):
+        pass
+
+    @property
+    def count(self) -> int:
+        return sum(len(column) for column in self.__cells)
+
+
+class Chunk:
+    def __init__(self, chunk_size: int) -> None:
+        self.cells: List[Optional[Cell]] = [None] * (chunk_size * chunk_size)
+        self.occupied = 0
+
+
+class ChunkedCells:
+    """
+    Sparse cell storage: cells are grouped in square chunks, hashed by
+    their position, which are allocated on the first insertion and freed
+    when all of their cells are empty.
+    """
+
+    def __init__(self, chunk_size: int) -> None:
+        self.__chunk_size = chunk_size
+        self.__chunks: Dict[Tuple[int, int], Chunk] = {}
+
+    def get(self, i: int, j: int) -> Optional[Cell]:
+        cs = self.__chunk_size
+        chunk = self.__chunks.get((i // cs, j // cs))
+
+        if chunk is None:
+            return None
+
+        return chunk.cells[(i % cs) * cs + j % cs]
+
+    def get_or_create(self, i: int, j: int) -> Cell:
+        cs = self.__chunk_size
+        key = (i // cs, j // cs)
+        chunk = self.__chunks.get(key)
+
+        if chunk is None:
+            chunk = self.__chunks[key] = Chunk(cs)
+
+        idx = (i % cs) * cs + j % cs
+        cell = chunk.cells[idx]
+
+        if cell is None:
+            cell = chunk.cells[idx] = {}
+            chunk.occupied += 1
+
+        return cell
+
+    def release(self, i: int, j: int):
+        """
+        Frees the cell at the given position, which must be empty.
+        """
+        cs = self.__chunk_size
+        key = (i // cs, j // cs)
+        chunk = self.__chunks.get(key)
+
+        if chunk is None:
+            return
+
+        idx = (i % cs) * cs + j % cs
+
+        if chunk.cells[idx] is not None:
+            chunk.cells[idx] = None
+            chunk.occupied -= 1
+
+            if chunk.occupied == 0:
+                del self.__chunks[key]
+
+    @property
+    def count(self) -> int:
+        return sum(chunk.occupied for chunk in self.__chunks.values())
+
+
+class WallLayer:
+    """
+    Static occupancy of walls, at cell resolution.
+
+    A cell is `FULL` when a single wall covers it entirely, so any rect
+    overlapping the cell collides with a wall. It is `PARTIAL` when walls
+    overlap it only in part (e.g. stones larger than a cell): in that case
+    the exact check against the overlapping wall rects is needed.
+
+    Cells can also be marked as `TILE`, i.e. entirely covered by a wall
+    which is not tracked by its rect (and hence can't be removed): they are
+    reported as `FULL`.
+
+    States are stored in numpy chunks: a single one covering the whole
+    layer, unless a chunk size is given.
+    """
+
+    FREE = 0
+    PARTIAL = 1
+    FULL = 2
+    TILE = 4
+
+    def __init__(
+            self,
+            cell_size: Tuple[int, int],
+            size: Tuple[int, int],
+            chunk_size: Optional[int] = None
+    ) -> None:
+        self.__cell_size = cell_size
+        self.__size = size
+        self.__chunk_size = (chunk_size, chunk_size) if chunk_size else size
+
+        self.__chunks: Dict[Tuple[int, int], np.ndarray] = {}
+        self.__rects: Dict[Tuple[int, int], List[Rect]] = {}
+
+        # without chunking, the single chunk is kept allocated and queried
+        # directly
+        self.__single: Optional[np.ndarray] = None
+
+        if chunk_size is None:
+            self.__single = self.__chunks[(0, 0)] = np.zeros(size, dtype=np.uint8)
+
+    def __get_cell_range(self, rect: Rect):
+        # Unlike the grid, only cells actually overlapped by the rect count:
+        # touching a wall along its border is not a collision.
+        x0 = max(rect.x // self.__cell_size[0], 0)
+        y0 = max(rect.y // self.__cell_size[1], 0)
+        x1 = min((rect.x + rect.width - 1) // self.__cell_size[0], self.__size[0] - 1)
+        y1 = min((rect.y + rect.height - 1) // self.__cell_size[1], self.__size[1] - 1)
+
+        return x0, y0, x1, y1
+
+    def __iter_chunks(self, x0: int, y0: int, x1: int, y1: int):
+        """
+        Yields the allocated chunks overlapping the given cell range, with
+        the slices of the chunk and of the range they have in common.
+        """
+        cw, ch = self.__chunk_size
+
+        for ci in range(x0 // cw, x1 // cw + 1):
+            for cj in range(y0 // ch, y1 // ch + 1):
+                chunk = self.__chunks.get((ci, cj))
+
+                if chunk is None:
+                    continue
+
+                i0 = max(x0, ci * cw)
+                i1 = min(x1, ci * cw + cw - 1)
+                j0 = max(y0, cj * ch)
+                j1 = min(y1, cj * ch + ch - 1)
+
+                yield (
+                    chunk[i0 - ci * cw:i1 - ci * cw + 1, j0 - cj * ch:j1 - cj * ch + 1],
+                    (slice(i0 - x0, i1 - x0 + 1), slice(j0 - y0, j1 - y0 + 1))
+                )
+
+    def __set_state(self, i: int, j: int, state: int):
+        cw, ch = self.__chunk_size
+        key = (i // cw, j // ch)
+        chunk = self.__chunks.get(key)
+
+        if chunk is None:
+            if state == WallLayer.FREE:
+                return
+
+            chunk = self.__chunks[key] = np.zeros(self.__chunk_size, dtype=np.uint8)
+
+        chunk[i % cw, j % ch] = (chunk[i % cw, j % ch] & WallLayer.TILE) | state
+
+        if state == WallLayer.FREE and chunk is not self.__single and not chunk.any():
+            del self.__chunks[key]
+
+    def __update_cell(self, i: int, j: int):
+        rects = self.__rects.get((i, j))
+
+        if not rects:
+            self.__rects.pop((i, j), None)
+            self.__set_state(i, j, WallLayer.FREE)
+            return
+
+        cell_rect = Rect(
+            i * self.__cell_size[0],
+            j * self.__cell_size[1],
+            self.__cell_size[0],
+            self.__cell_size[1]
+        )
+
+        if any(r.contains(cell_rect) for r in rects):
+            self.__set_state(i, j, WallLayer.FULL)
+        else:
+            self.__set_state(i, j, WallLayer.PARTIAL)
+
+    def add_tiles(self, mask: np.ndarray, x0: int = 0, y0: int = 0):
+        """
+        Marks as tiles the cells where `mask` (indexed as [x, y], with
+        origin at the cell x0, y0) is true.
+        """
+        x1 = min(x0 + mask.shape[0], self.__size[0]) - 1
+        y1 = min(y0 + mask.shape[1], self.__size[1]) - 1
+        cw, ch = self.__chunk_size
+
+        for ci in range(x0 // cw, x1 // cw + 1):
+            for cj in range(y0 // ch, y1 // ch + 1):
+                i0 = max(x0, ci * cw)
+                i1 = min(x1, ci * cw + cw - 1)
+                j0 = max(y0, cj * ch)
+                j1 = min(y1, cj * ch + ch - 1)
+
+                part = mask[i0 - x0:i1 - x0 + 1, j0 - y0:j1 - y0 + 1]
+
+                if not part.any():
+                    continue
+
+                chunk = self.__chunks.get((ci, cj))
+
+                if chunk is None:
+                    chunk = self.__chunks[(ci, cj)] = np.zeros(self.__chunk_size, dtype=np.uint8)
+
+                chunk[i0 - ci * cw:i1 - ci * cw + 1, j0 - cj * ch:j1 - cj * ch + 1] |= \
+                    part.astype(np.uint8) * WallLayer.TILE
+
+    def add(self, rect: Rect):
+        x0, y0, x1, y1 = self.__get_cell_range(rect)
+
+        for i in range(x0, x1 + 1):
+            for j in range(y0, y1 + 1):
+                self.__rects.setdefault((i, j), []).append(Rect(rect))
+                self.__update_cell(i, j)
+
+    def remove(self, rect: Rect):
+        x0, y0, x1, y1 = self.__get_cell_range(rect)
+
+        for i in range(x0, x1 + 1):
+            for j in range(y0, y1 + 1):
+                rects = self.__rects.get((i, j))
+
+                if rects is not None and rect in rects:
+                    rects.remove(rect)
+
+                self.__update_cell(i, j)
+
+    def __get_state(self, x0: int, y0: int, x1: int, y1: int) -> int:
+        """
+        The highest state of the cells in the given range.
+        """
+        if x0 > x1 or y0 > y1:
+            return WallLayer.FREE
+
+        if self.__single is not None:
+            return int(self.__single[x0:x1 + 1, y0:y1 + 1].max())
+
+        state = WallLayer.FREE
+
+        for cells, _ in self.__iter_chunks(x0, y0, x1, y1):
+            state = max(state, int(cells.max()))
+
+        return state
+
+    @staticmethod
+    def __get_offset(d: int, n: int, k: int) -> int:
+        # offset after k of the n steps of a move by d, rounded
+        return (2 * d * k + n) // (2 * n)
+
+    @staticmethod
+    def __get_first_step(d: int, n: int, target: int) -> int:
+        """
+        First of the n steps of a move by d (not 0) at which the offset
+        reaches `target`, moving toward it.
+        """
+        if d > 0:
+            return -((n - 2 * n * target) // (2 * d))
+
+        return (2 * n * target + n) // (2 * d) + 1
+
+    def sweep(self, rect: Rect, dx: int, dy: int, bounds: Rect) -> Tuple[int, int, float]:
+        """
+        Moves the rect toward (dx, dy), a pixel at a time along the line,
+        up to the last position inside `bounds` and not blocked by walls.
+        Returns the offset reached and the time of impact, as the fraction
+        of the move done (1 when nothing was hit).
+
+        Cells are traversed as by a DDA: positions are only checked when an
+        edge of the rect enters new cells, unless the rect overlaps cells
+        partially covered by walls.
+        """
+        n = max(abs(dx), abs(dy))
+
+        if n == 0:
+            return 0, 0, 1.0
+
+        cw, ch = self.__cell_size
+        get_offset = WallLayer.__get_offset
+        get_first_step = WallLayer.__get_first_step
+
+        # last step inside the bounds
+        last = n
+
+        if dx > 0:
+            last = min(last, get_first_step(dx, n, bounds.right - rect.right + 1) - 1)
+        elif dx < 0:
+            last = min(last, get_first_step(dx, n, bounds.left - rect.left - 1) - 1)
+
+        if dy > 0:
+            last = min(last, get_first_step(dy, n, bounds.bottom - rect.bottom + 1) - 1)
+        elif dy < 0:
+            last = min(last, get_first_step(dy, n, bounds.top - rect.top - 1) - 1)
+
+        k = 0
+
+        while k < max(last, 0):
+            moved = rect.move(get_offset(dx, n, k), get_offset(dy, n, k))
+
+            if self.__get_state(*self.__get_cell_range(moved)) == WallLayer.FREE:
+                # until the next step entering new cells, the rect can't hit
+                # anything
+                following = last + 1
+
+                if dx > 0:
+                    target = ((moved.right - 1) // cw + 1) * cw - (rect.right - 1)
+                    following = min(following, get_first_step(dx, n, target))
+                elif dx < 0:
+                    target = (moved.left // cw) * cw - 1 - rect.left
+                    following = min(following, get_first_step(dx, n, target))
+
+                if dy > 0:
+                    target = ((moved.bottom - 1) // ch + 1) * ch - (rect.bottom - 1)
+                    following = min(following, get_first_step(dy, n, target))
+                elif dy < 0:
+                    target = (moved.top // ch) * ch - 1 - rect.top
+                    following = min(following, get_first_step(dy, n, target))
+            else:
+                following = k + 1
+
+            if following > last:
+                k = last
+                break
+
+            if self.is_blocked(rect.move(get_offset(dx, n, following), get_offset(dy, n, following))):
+                k = following - 1
+                break
+
+            k = following
+
+        k = max(k, 0)
+
+        return get_offset(dx, n, k), get_offset(dy, n, k), k / n
+
+    def slide(self, rect: Rect, dx: int, dy: int, bounds: Rect) -> Tuple[int, int]:
+        """
+        Returns the offset the rect is moved by toward (dx, dy): up to the
+        first wall hit (see `sweep`), then along it, by what is left of the
+        move on each axis.
+        """
+        ox, oy, toi = self.sweep(rect, dx, dy, bounds)
+
+        if toi < 1:
+            ox += self.sweep(rect.move(ox, oy), dx - ox, 0, bounds)[0]
+            oy += self.sweep(rect.move(ox, oy), 0, dy - oy, bounds)[1]
+
+        return ox, oy
+
+    def is_blocked(self, rect: Rect) -> bool:
+        if rect.width <= 0 or rect.height <= 0:
+            return False
+
+        x0, y0, x1, y1 = self.__get_cell_range(rect)
+
+        if x0 > x1 or y0 > y1:
+            return False
+
+        state = self.__get_state(x0, y0, x1, y1)
+
+        if state == WallLayer.FREE:
+            return False
+
+        if state >= WallLayer.FULL:
+            return True
+
+        for i in range(x0, x1 + 1):
+            for j in range(y0, y1 + 1):
+                rects = self.__rects.get((i, j))
+
+                if rects and rect.collidelist(rects) != -1:
+                    return True
+
+        return False
+
+    def region(self, x0: int, y0: int, x1: int, y1: int, fill: int = FREE) -> np.ndarray:
+        """
+        Returns a copy of the states of the cells in the given range (bounds
+        included), indexed as [x, y]. Cells outside the layer get `fill`.
+        """
+        states = np.full((x1 - x0 + 1, y1 - y0 + 1), fill, dtype=np.uint8)
+
+        cx0, cy0 = max(x0, 0), max(y0, 0)
+        cx1, cy1 = min(x1, self.__size[0] - 1), min(y1, self.__size[1] - 1)
+
+        if cx0 > cx1 or cy0 > cy1:
+            return states
+
+        inner = states[cx0 - x0:cx1 - x0 + 1, cy0 - y0:cy1 - y0 + 1]
+        inner[...] = WallLayer.FREE
+
+        for cells, target in self.__iter_chunks(cx0, cy0, cx1, cy1):
+            inner[target] = np.minimum(cells, WallLayer.FULL)
+
+        return states
+
+    def get_states(self, i: np.ndarray, j: np.ndarray) -> np.ndarray:
+        """
+        Returns the states of the cells at the given positions (arrays of
+        the same shape, inside the layer), as `region` does. Only the chunks
+        holding the cells are read.
+        """
+        if self.__single is not None:
+            return np.minimum(self.__single[i, j], WallLayer.FULL)
+
+        states = np.zeros(i.shape, dtype=np.uint8)
+
+        if states.size == 0:
+            return states
+
+        cw, ch = self.__chunk_size
+        i, j = i.ravel(), j.ravel()
+
+        # positions are grouped by chunk
+        keys, inverse = np.unique(np.stack((i // cw, j // ch), axis=1), axis=0, return_inverse=True)
+        inverse = inverse.ravel()
+        order = np.argsort(inverse, kind='stable')
+        bounds = np.searchsorted(inverse[order], np.arange(len(keys) + 1))
+        flat = states.reshape(-1)
+
+        for k, (ci, cj) in enumerate(keys.tolist()):
+            chunk = self.__chunks.get((ci, cj))
+
+            if chunk is None:
+                continue
+
+            group = order[bounds[k]:bounds[k + 1]]
+            flat[group] = np.minimum(chunk[i[group] - ci * cw, j[group] - cj * ch], WallLayer.FULL)
+
+        return states
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        return self.__size
+
+
 class Grid:
-    def __init__(self, cell_size: Tuple[int, int], grid_size: Tuple[int, int]) -> None:
+    def __init__(
+            self,
+            cell_size: Tuple[int, int],
+            grid_size: Tuple[int, int],
+            chunk_size: Optional[int] = None
+    ) -> None:
+        """
+        Cells are allocated for the whole grid, unless `chunk_size` is given:
+        in that case they are allocated, in square chunks of that size, only
+        where items are, so that memory scales with the occupied cells.
+        """
         self.__area = cell_size[0] * grid_size[0],  cell_size[1] * grid_size[1]
 
         self.__cell_size = cell_size
 
         # sprites aligned with the border could result in "list index out of range"
         # hence foro safety reason the grid is increased by 1 unit for both x and y.
-        x = range(grid_size[0] + 1)
-        y = range(grid_size[1] + 1)
-        self.__grid: List[List[Dict[str, Item]]] = [[{} for _ in y] for _ in x]
+        size = grid_size[0] + 1, grid_size[1] + 1
+
+        # each cell groups its items by type, so typed queries only visit
+        # the relevant buckets
+        if chunk_size is None:
+            self.__cells = DenseCells(size)
+        else:
+            self.__cells = ChunkedCells(chunk_size)
+
+        # walls never move, so they are also kept in a precomputed layer
+        # answering "is this rect blocked" without visiting the items
+        self.__walls = WallLayer(cell_size, size, chunk_size)
+
+        # cells currently covered by each item, as (x0, y0, x1, y1)
+        self.__spans: Dict[int, Tuple[int, int, int, int]] = {}
+
+        # number of queries answered, for profiling
+        self.__queries = 0
 
     def __get_grid_rect(self, rect: Rect):
         x0 = rect.x // self.__cell_size[0]
@@ -71,37 +583,267 @@ class Grid:
 
         return x0, y0, x1, y1
 
+    def __add_to_cell(self, i: int, j: int, item: Item):
+        cell = self.__cells.get_or_create(i, j)
+        bucket = cell.get(item.item_type)
+
+        if bucket is None:
+            bucket = cell[item.item_type] = {}
+
+        bucket[item.id] = item
+
+    def __remove_from_cell(self, i: int, j: int, item: Item):
+        cell = self.__cells.get(i, j)
+
+        if not cell:
+            return
+
+        bucket = cell.get(item.item_type)
+
+        if bucket is not None and item.id in bucket:
+            del bucket[item.id]
+
+            if not bucket:
+                del cell[item.item_type]
+
+                if not cell:
+                    self.__cells.release(i, j)
+
     @property
     def area(self) -> Tuple[int, int]:
         return self.__area
 
+    @property
+    def cell_size(self) -> Tuple[int, int]:
+        return self.__cell_size
+
+    @property
+    def walls(self) -> WallLayer:
+        return self.__walls
+
+    @property
+    def allocated_cells(self) -> int:
+        return self.__cells.count
+
+    @property
+    def query_count(self) -> int:
+        return self.__queries
+
     def insert_items(self, *args: Item):
         for i in args:
             self.insert_item(i)
 
     def insert_item(self, item: Item):
-        x0, y0, x1, y1 = self.__get_grid_rect(item.rect)
+        rect = item.rect
+        span = self.__get_grid_rect(rect)
+        x0, y0, x1, y1 = span
 
         for i in range(x0, x1+1):
             for j in range(y0, y1 + 1):
-                self.__grid[i][j][item.id] = item
+                self.__add_to_cell(i, j, item)
+
+        self.__spans[item.id] = span
+
+        if item.item_type is ItemType.wall:
+            self.__walls.add(rect)
 
     def remove_item(self, item: Item):
-        x0, y0, x1, y1 = self.__get_grid_rect(item.rect)
-        id = item.id
+        # the recorded cells are used, since the item could have been moved
+        # after its insertion
+        span = self.__spans.pop(item.id, None)
+        x0, y0, x1, y1 = span or self.__get_grid_rect(item.rect)
+
+        if item.item_type is ItemType.wall:
+            self.__walls.remove(item.rect)
 
         for i in range(x0, x1+1):
             for j in range(y0, y1+1):
-                cell = self.__grid[i][j]
+                self.__remove_from_cell(i, j, item)
 
-                if id in cell:
-                    del cell[id]
+    def move_item(self, item: Item, old_rect: Rect, new_rect: Rect):
+        id = item.id
+
+        old_span = self.__spans.get(id) or self.__get_grid_rect(old_rect)
+        new_span = self.__get_grid_rect(new_rect)
+
+        if item.item_type is ItemType.wall:
+            self.__walls.remove(old_rect)
+            self.__walls.add(new_rect)
+
+        self.__spans[id] = new_span
+
+        if old_span == new_span:
+            return
+
+        ox0, oy0, ox1, oy1 = old_span
+        nx0, ny0, nx1, ny1 = new_span
+
+        # only the cells which are not shared by the two spans are updated
+        for i in range(ox0, ox1 + 1):
+            for j in range(oy0, oy1 + 1):
+                if nx0 <= i <= nx1 and ny0 <= j <= ny1:
+                    continue
+
+                self.__remove_from_cell(i, j, item)
+
+        for i in range(nx0, nx1 + 1):
+            for j in range(ny0, ny1 + 1):
+                if ox0 <= i <= ox1 and oy0 <= j <= oy1:
+                    continue
+
+                self.__add_to_cell(i, j, item)
+
+    def iter_items_in_area(
+            self,
+            rect: Rect,
+            item_types: Union[ItemType, Iterable[ItemType], None] = None,
+            exclude_id: Optional[int] = None
+    ) -> Iterator[Item]:
+        """
+        Lazily yields the items in the cells covered by `rect`, each one once.
+
+        Items can be restricted to the given types, and the item with id
+        `exclude_id` (usually the one querying) is skipped.
+        """
+        self.__queries += 1
 
-    def items_in_area(self, rect: Rect) -> List[Item]:
         x0, y0, x1, y1 = self.__get_grid_rect(rect)
 
-        area_dict = {
-            id: item for i in range(x0, x1 + 1) for j in range(y0, y1 + 1) for id, item in self.__grid[i][j].items()
-        }
+        if isinstance(item_types, ItemType):
+            item_types = (item_types,)
+
+        spans = self.__spans
+        get_cell = self.__cells.get
+
+        for i in range(x0, x1 + 1):
+            for j in range(y0, y1 + 1):
+                cell = get_cell(i, j)
+
+                if not cell:
+                    continue
+
+                if item_types is None:
+                    buckets = cell.values()
+                else:
+                    buckets = (cell.get(t) for t in item_types)
+
+                for bucket in buckets:
+                    if not bucket:
+                        continue
+
+                    for id, item in bucket.items():
+                        if id == exclude_id:
+                            continue
+
+                        # an item covering several cells is yielded only
+                        # from the first of them falling into the area
+                        sx0, sy0, _, _ = spans[id]
+
+                        if i != max(sx0, x0) or j != max(sy0, y0):
+                            continue
+
+                        yield item
+
+    def iter_overlapping_pairs(
+            self,
+            items: Sequence[Item],
+            item_types: Optional[Callable[[Item], Iterable[ItemType]]] = None
+    ) -> Iterator[Tuple[Item, Item]]:
+        """
+        Yields the pairs of overlapping items, the first of each pair taken
+        from `items` and the other one found in the grid, with a single pass
+        over the cells covered by `items`. For each of the items, the others
+        can be restricted to the types returned by `item_types`.
+
+        Each pair is yielded once, also when both items are in `items` and
+        could find each other: it's then yielded from the one coming first.
+        """
+        self.__queries += 1
+
+        spans = self.__spans
+        get_cell = self.__cells.get
+
+        order = {item.id: k for k, item in enumerate(items)}
+        types = [
+            None if item_types is None else tuple(item_types(item)) for item in items
+        ]
+
+        for k, item in enumerate(items):
+            id = item.id
+            span = spans.get(id)
+
+            if span is None:
+                continue
+
+            x0, y0, x1, y1 = span
+            rect = item.rect
+
+            for i in range(x0, x1 + 1):
+                for j in range(y0, y1 + 1):
+                    cell = get_cell(i, j)
+
+                    if not cell:
+                        continue
+
+                    if types[k] is None:
+                        buckets = cell.values()
+                    else:
+                        buckets = (cell.get(t) for t in types[k])
+
+                    for bucket in buckets:
+                        if not bucket:
+                            continue
+
+                        for other_id, other in bucket.items():
+                            if other_id == id:
+                                continue
+
+                            # skipped if already found from the other item
+                            other_k = order.get(other_id)
+
+                            if other_k is not None and other_k < k and (
+                                types[other_k] is None or item.item_type in types[other_k]
+                            ):
+                                continue
+
+                            # a pair is considered only in the first cell
+                            # shared by its items
+                            ox0, oy0, _, _ = spans[other_id]
+
+                            if i != max(ox0, x0) or j != max(oy0, y0):
+                                continue
+
+                            if rect.colliderect(other.rect):
+                                yield item, other
+
+    def fill_items_in_area(
+            self,
+            buffer: List[Item],
+            rect: Rect,
+            item_types: Union[ItemType, Iterable[ItemType], None] = None,
+            exclude_id: Optional[int] = None
+    ) -> int:
+        """
+        Same as `iter_items_in_area`, but the items are stored in the given
+        buffer (cleared first). Returns the number of items found.
+        """
+        buffer.clear()
+        buffer.extend(self.iter_items_in_area(rect, item_types, exclude_id))
+
+        return len(buffer)
+
+    def items_in_area(self, rect: Rect) -> List[Item]:
+        return list(self.iter_items_in_area(rect))
+
+    def is_blocked(self, rect: Rect) -> bool:
+        self.__queries += 1
+
+        return self.__walls.is_blocked(rect)
+
+    def slide(self, rect: Rect, dx: int, dy: int, area: Rect) -> Tuple[int, int]:
+        """
+        See `WallLayer.slide`.
+        """
+        self.__queries += 1
 
-        return list(area_dict.values())
+        return self.__walls.slide(rect, dx, dy, area)
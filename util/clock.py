@@ -0,0 +1,64 @@
+import pygame as pg
+
+
+class Clock:
+    """
+    Source of time for the game loop and every module reading ticks.
+    """
+
+    def get_ticks(self) -> int:
+        raise NotImplementedError(
+            '"get_ticks" method must be implemented in subclasses')
+
+    def get_time(self) -> int:
+        raise NotImplementedError(
+            '"get_time" method must be implemented in subclasses')
+
+    def tick(self, framerate: int = 0) -> int:
+        raise NotImplementedError(
+            '"tick" method must be implemented in subclasses')
+
+
+class RealClock(Clock):
+    """
+    Wall clock time, as provided by pygame.
+    """
+
+    def __init__(self) -> None:
+        self.__clock = pg.time.Clock()
+
+    def get_ticks(self) -> int:
+        return pg.time.get_ticks()
+
+    def get_time(self) -> int:
+        return self.__clock.get_time()
+
+    def tick(self, framerate: int = 0) -> int:
+        return self.__clock.tick(framerate)
+
+
+class VirtualClock(Clock):
+    """
+    Clock advancing by a fixed step on every tick, regardless of the
+    elapsed real time: the frame rate is ignored and nothing waits.
+    """
+
+    def __init__(self, step_millis: int = 40, start_millis: int = 0) -> None:
+        self.__step_millis = step_millis
+        self.__ticks = start_millis
+        self.__time = 0
+
+    def get_ticks(self) -> int:
+        return self.__ticks
+
+    def get_time(self) -> int:
+        return self.__time
+
+    def tick(self, framerate: int = 0) -> int:
+        self.__time = self.__step_millis
+        self.__ticks += self.__step_millis
+
+        return self.__time
+
+
+real_clock = RealClock()
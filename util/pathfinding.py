@@ -0,0 +1,224 @@
+from typing import Dict, Sequence, Tuple
+
+import numpy as np
+from pygame import Rect
+
+from util import Grid, Item, WallLayer
+
+# neighbour cells a hunter can step to: orthogonal ones first, so that they
+# win ties
+NEIGHBOURS = ((1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (1, -1), (-1, 1), (-1, -1))
+
+# offsets of the cells read around a hunter: its own and the neighbours
+OFFSETS = np.array(((0, 0), *NEIGHBOURS), dtype=np.int64)
+
+# orthogonal neighbours a diagonal step goes by, horizontally and vertically
+DIAGONAL_SIDES_X = [NEIGHBOURS.index((di, 0)) for di, _ in NEIGHBOURS[4:]]
+DIAGONAL_SIDES_Y = [NEIGHBOURS.index((0, dj)) for _, dj in NEIGHBOURS[4:]]
+
+UNREACHABLE = np.iinfo(np.int32).max
+
+TWO_PI = 2 * np.pi
+
+# cells covered by a target, origin of the window and distances in it
+Field = Tuple[Tuple[int, int, int, int], Tuple[int, int], np.ndarray]
+
+
+class PathFinder:
+    """
+    Headings toward the nearest target, for many hunters at once.
+
+    For each target (and each hunter footprint, in cells) a distance field
+    is computed by a breadth first search on the wall layer, over the cells
+    where the footprint fits with no walls, within `radius` cells of the
+    target. Fields are cached and computed again only when their target
+    enters other cells, so all the hunters share them: each hunter just
+    reads the field around its cell and heads to the neighbour closest to
+    the target.
+
+    Walls are read from the layer only in the window of each field, so
+    that memory and time do not depend on the size of the map.
+    """
+
+    def __init__(self, grid: Grid, radius: int = 16, max_distance: int = 64) -> None:
+        self.__walls = grid.walls
+        self.__cell_size = grid.cell_size
+        self.__radius = radius
+        self.__max_distance = max_distance
+
+        # only the cells in the area: the wall layer has one more row and
+        # column
+        self.__size = grid.area[0] // self.__cell_size[0], grid.area[1] // self.__cell_size[1]
+
+        self.__fields: Dict[Tuple[int, int, int], Field] = {}
+
+    def __get_passable(self, x0: int, y0: int, x1: int, y1: int, kx: int, ky: int) -> np.ndarray:
+        """
+        Cells of the given range (bounds included) where a footprint of kx
+        by ky cells (from its top left one) covers no walls and lies in the
+        area.
+        """
+        sx, sy = self.__size
+
+        # the footprints of the range reach kx - 1 and ky - 1 cells past it
+        free = np.zeros((x1 - x0 + kx, y1 - y0 + ky), dtype=bool)
+        rx1, ry1 = min(x1 + kx - 1, sx - 1), min(y1 + ky - 1, sy - 1)
+
+        if rx1 >= x0 and ry1 >= y0:
+            free[:rx1 - x0 + 1, :ry1 - y0 + 1] = self.__walls.region(x0, y0, rx1, ry1) == WallLayer.FREE
+
+        # walls in each footprint, by the summed area table
+        table = np.zeros((free.shape[0] + 1, free.shape[1] + 1), dtype=np.int32)
+        table[1:, 1:] = np.cumsum(np.cumsum(~free, axis=0), axis=1)
+
+        walls = table[kx:, ky:] - table[:-kx, ky:] - table[kx:, :-ky] + table[:-kx, :-ky]
+
+        return walls == 0
+
+    def __get_cells(self, rect: Rect) -> Tuple[int, int, int, int]:
+        cw, ch = self.__cell_size
+
+        return rect.x // cw, rect.y // ch, (rect.right - 1) // cw, (rect.bottom - 1) // ch
+
+    def __compute_field(self, cells: Tuple[int, int, int, int], kx: int, ky: int) -> Field:
+        sx, sy = self.__size
+        x0, y0, x1, y1 = cells
+        r = self.__radius
+
+        ox0, oy0 = max(x0 - r, 0), max(y0 - r, 0)
+        ox1, oy1 = max(min(x1 + r, sx - 1), ox0), max(min(y1 + r, sy - 1), oy0)
+
+        # The window is searched flattened, with a border of walls, so that
+        # neighbours are at fixed offsets and never wrap around.
+        window = np.zeros((ox1 - ox0 + 3, oy1 - oy0 + 3), dtype=bool)
+        window[1:-1, 1:-1] = self.__get_passable(ox0, oy0, ox1, oy1, kx, ky)
+
+        # the search starts from the footprints overlapping the target
+        seeds = np.zeros(window.shape, dtype=bool)
+        seeds[
+            max(x0 - kx + 1, ox0) - ox0 + 1:min(x1, ox1) - ox0 + 2,
+            max(y0 - ky + 1, oy0) - oy0 + 1:min(y1, oy1) - oy0 + 2
+        ] = True
+
+        frontier = (seeds & window).ravel()
+        unvisited = window.ravel() & ~frontier
+
+        distances = np.full(frontier.shape, -1, dtype=np.int32)
+        distances[frontier] = 0
+
+        grown = np.empty(frontier.shape, dtype=bool)
+        stride = window.shape[1]
+        shifts = [
+            (grown[1:], frontier[:-1]),
+            (grown[:-1], frontier[1:]),
+            (grown[stride:], frontier[:-stride]),
+            (grown[:-stride], frontier[stride:])
+        ]
+
+        distance = 0
+
+        # the whole frontier is expanded at each step
+        while distance < self.__max_distance and frontier.any():
+            distance += 1
+
+            grown.fill(False)
+
+            for target, source in shifts:
+                np.logical_or(target, source, out=target)
+
+            np.logical_and(grown, unvisited, out=frontier)
+            unvisited ^= frontier
+            distances[frontier] = distance
+
+        distances = distances.reshape(window.shape)[1:-1, 1:-1]
+
+        return cells, (ox0, oy0), distances
+
+    def __get_field(self, target: Item, kx: int, ky: int) -> Field:
+        key = (target.id, kx, ky)
+        cells = self.__get_cells(target.rect)
+        field = self.__fields.get(key)
+
+        if field is None or field[0] != cells:
+            field = self.__fields[key] = self.__compute_field(cells, kx, ky)
+
+        return field
+
+    def get_headings(self, targets: Sequence[Item], rects: Sequence[Rect]) -> np.ndarray:
+        """
+        Returns, for each hunter rect, the angle (in radians) to head to in
+        order to reach the nearest target, or nan when no target is within
+        reach.
+        """
+        headings = np.full(len(rects), np.nan)
+
+        if not rects or not targets:
+            return headings
+
+        cw, ch = self.__cell_size
+
+        x = np.array([r.x for r in rects], dtype=np.int64)
+        y = np.array([r.y for r in rects], dtype=np.int64)
+        w = np.array([r.width for r in rects], dtype=np.int64)
+        h = np.array([r.height for r in rects], dtype=np.int64)
+
+        # footprints are the cells each hunter covers where it stands, which
+        # are one more than its size in cells when it is not aligned on them
+        cx, cy = x // cw, y // ch
+        kx, ky = (x + w - 1) // cw - cx + 1, (y + h - 1) // ch - cy + 1
+
+        # distance to the nearest target found so far
+        nearest = np.full(len(rects), UNREACHABLE, dtype=np.int64)
+
+        for fkx, fky in set(zip(kx.tolist(), ky.tolist())):
+            hunters = np.flatnonzero((kx == fkx) & (ky == fky))
+            hx, hy, hw, hh = x[hunters], y[hunters], w[hunters], h[hunters]
+            hcx, hcy = cx[hunters], cy[hunters]
+
+            for target in targets:
+                _, (ox, oy), distances = self.__get_field(target, fkx, fky)
+
+                # distances of the cell of each hunter and of its neighbours
+                i = hcx + OFFSETS[:, :1] - ox
+                j = hcy + OFFSETS[:, 1:] - oy
+                inside = (i >= 0) & (i < distances.shape[0]) & (j >= 0) & (j < distances.shape[1])
+
+                read = np.full(i.shape, UNREACHABLE, dtype=np.int64)
+                read[inside] = distances[i[inside], j[inside]]
+                read[read < 0] = UNREACHABLE
+
+                here, around = read[0], read[1:]
+
+                # no corners are cut: diagonal steps need both the orthogonal
+                # ones to be free
+                blocked = (around[DIAGONAL_SIDES_X] == UNREACHABLE) \
+                    | (around[DIAGONAL_SIDES_Y] == UNREACHABLE)
+                around[4:][blocked] = UNREACHABLE
+
+                closer = here < nearest[hunters]
+
+                if not closer.any():
+                    continue
+
+                nearest[hunters[closer]] = here[closer]
+
+                # next to the target, hunters head straight to it
+                arrived = closer & (here == 0)
+                tx = target.rect.centerx - (hx + hw / 2)
+                ty = target.rect.centery - (hy + hh / 2)
+
+                best = np.argmin(around, axis=0)
+                stepping = closer & (here > 0) & (around[best, np.arange(len(hunters))] < here)
+
+                sx = (hcx + OFFSETS[best + 1, 0]) * cw - hx
+                sy = (hcy + OFFSETS[best + 1, 1]) * ch - hy
+
+                dx = np.where(arrived, tx, sx)
+                dy = np.where(arrived, ty, sy)
+
+                steered = (arrived & ((tx != 0) | (ty != 0))) | stepping
+                alpha = np.arctan2(-dy, dx) % TWO_PI
+
+                headings[hunters[closer]] = np.where(steered, alpha, np.nan)[closer]
+
+        return headings
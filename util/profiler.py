@@ -0,0 +1,164 @@
+import csv
+import json
+import os
+import sys
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+import numpy as np
+import pygame as pg
+from pygame import Surface
+
+PERCENTILES = (50, 90, 99)
+
+WHITE = (255, 255, 255)
+
+# frames between refreshes of the overlay (once a second at 25 FPS)
+OVERLAY_REFRESH_FRAMES = 25
+
+
+class FrameProfiler:
+    """
+    Timings of the phases of each frame, with counters of the work done.
+
+    A frame is split into phases by marking the end of each of them: the
+    time from the previous mark is charged to the phase, so each mark costs
+    a single clock read. Timings and counters of the last `window` frames
+    are kept, to report rolling percentiles.
+    """
+
+    def __init__(self, window: int = 500) -> None:
+        self.__window = window
+
+        self.__timings: Dict[str, Deque[float]] = {}
+        self.__counters: Dict[str, Deque[float]] = {}
+
+        self.__frame_timings: Dict[str, float] = {}
+        self.__frame_counters: Dict[str, float] = {}
+
+        self.__frame_start = 0
+        self.__last_mark = 0
+        self.__blocks = 0
+
+        self.__frames = 0
+
+        # lines of the overlay, rendered again every few frames only
+        self.__font: Optional[pg.font.Font] = None
+        self.__overlay: List[Surface] = []
+        self.__overlay_frame = -OVERLAY_REFRESH_FRAMES
+
+    def start_frame(self):
+        self.__frame_timings.clear()
+        self.__frame_counters.clear()
+
+        # net number of memory blocks allocated along the frame
+        self.__blocks = sys.getallocatedblocks()
+
+        self.__frame_start = self.__last_mark = time.perf_counter_ns()
+
+    def mark(self, phase: str):
+        """
+        Ends the given phase of the frame.
+        """
+        now = time.perf_counter_ns()
+
+        self.__frame_timings[phase] = self.__frame_timings.get(phase, 0) + (now - self.__last_mark) / 1e6
+        self.__last_mark = now
+
+    def count(self, counter: str, n: float = 1):
+        self.__frame_counters[counter] = self.__frame_counters.get(counter, 0) + n
+
+    def end_frame(self):
+        self.__frame_timings['frame'] = (time.perf_counter_ns() - self.__frame_start) / 1e6
+        self.__frame_counters['allocated_blocks'] = sys.getallocatedblocks() - self.__blocks
+
+        for samples, frame_samples in (
+            (self.__timings, self.__frame_timings),
+            (self.__counters, self.__frame_counters)
+        ):
+            for name, value in frame_samples.items():
+                if name not in samples:
+                    samples[name] = deque(maxlen=self.__window)
+
+                samples[name].append(value)
+
+        self.__frames += 1
+
+    @staticmethod
+    def __get_stats(samples: Dict[str, Deque[float]]) -> Dict[str, Dict[str, float]]:
+        stats = {}
+
+        for name, values in samples.items():
+            a = np.fromiter(values, dtype=np.float64, count=len(values))
+            p = np.percentile(a, PERCENTILES)
+
+            stats[name] = {
+                'mean': float(a.mean()),
+                **{f'p{q}': float(v) for q, v in zip(PERCENTILES, p)},
+                'max': float(a.max())
+            }
+
+        return stats
+
+    def stats(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """
+        Statistics over the window, as {'timings': ..., 'counters': ...},
+        each mapping a phase (times in milliseconds) or counter to its
+        mean, percentiles and max.
+        """
+        return {
+            'timings': FrameProfiler.__get_stats(self.__timings),
+            'counters': FrameProfiler.__get_stats(self.__counters)
+        }
+
+    def export(self, path: str):
+        """
+        Writes the statistics to a JSON file, or to a CSV one (one row for
+        each phase and counter) when the path ends with ".csv".
+        """
+        stats = self.stats()
+
+        # written aside and then moved, so that readers never see a partial file
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+
+        with open(tmp_path, 'w', newline='') as f:
+            if path.endswith('.csv'):
+                columns = ['mean', *(f'p{q}' for q in PERCENTILES), 'max']
+                writer = csv.writer(f)
+                writer.writerow(['kind', 'name', *columns])
+
+                for kind, kind_stats in stats.items():
+                    for name, s in kind_stats.items():
+                        writer.writerow([kind, name, *(f'{s[c]:.4f}' for c in columns)])
+            else:
+                json.dump({'frames': self.__frames, 'window': self.__window, **stats}, f, indent=2)
+
+        os.replace(tmp_path, path)
+
+    def draw(self, surface: Surface, x: int, y: int):
+        """
+        Draws the median and 99th percentile of each phase, from the given
+        position. They are computed again every `OVERLAY_REFRESH_FRAMES`
+        frames only.
+        """
+        if self.__frames - self.__overlay_frame >= OVERLAY_REFRESH_FRAMES:
+            if self.__font is None:
+                self.__font = pg.font.Font(None, 18)
+
+            lines: List[str] = ['ms     p50    p99']
+
+            for name, s in FrameProfiler.__get_stats(self.__timings).items():
+                lines.append(f'{name[:8]:8} {s["p50"]:6.2f} {s["p99"]:6.2f}')
+
+            self.__overlay = [self.__font.render(line, True, WHITE) for line in lines]
+            self.__overlay_frame = self.__frames
+
+        for text_surface in self.__overlay:
+            surface.blit(source=text_surface, dest=(x, y))
+
+            y += text_surface.get_rect().height
+
+    @property
+    def frames(self) -> int:
+        return self.__frames
@@ -0,0 +1,77 @@
+import heapq
+from typing import Any, Callable, List, Tuple
+
+
+class Event:
+    def __init__(self, due: int, callback: Callable[..., Any], args: Tuple) -> None:
+        self.due = due
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+# sequence number and pending events (with their cancelled flag)
+SchedulerState = Tuple[int, List[Tuple[int, int, Event, bool]]]
+
+
+class Scheduler:
+    """
+    Events fired at a given time of the game clock.
+
+    Events are kept in a heap by due time, so that running the due ones
+    costs only for them, however many are pending. Cancelled events are
+    just skipped when their time comes.
+    """
+
+    def __init__(self) -> None:
+        self.__heap: List[Tuple[int, int, Event]] = []
+        self.__seq = 0
+
+    def schedule(self, due: int, callback: Callable[..., Any], *args: Any) -> Event:
+        event = Event(due, callback, args)
+
+        # the sequence number keeps the scheduling order among events due
+        # at the same time
+        heapq.heappush(self.__heap, (due, self.__seq, event))
+        self.__seq += 1
+
+        return event
+
+    def run_due(self, current_timestamp: int) -> int:
+        """
+        Fires, in order, the events due up to the given time (included),
+        returning how many were fired.
+        """
+        fired = 0
+
+        while self.__heap and self.__heap[0][0] <= current_timestamp:
+            _, _, event = heapq.heappop(self.__heap)
+
+            if event.cancelled:
+                continue
+
+            event.callback(*event.args)
+            fired += 1
+
+        return fired
+
+    def snapshot(self) -> SchedulerState:
+        """
+        The pending events, to get back to with `restore`.
+        """
+        return self.__seq, [(due, seq, e, e.cancelled) for due, seq, e in self.__heap]
+
+    def restore(self, state: SchedulerState):
+        self.__seq, entries = state
+
+        # a copy of a heap is still a heap
+        self.__heap = [(due, seq, e) for due, seq, e, _ in entries]
+
+        for _, _, e, cancelled in entries:
+            e.cancelled = cancelled
+
+    def __len__(self) -> int:
+        return len(self.__heap)
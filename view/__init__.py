@@ -1,5 +1,7 @@
 import math
+from typing import Optional, Tuple
 
+import numpy as np
 import pygame as pg
 from pygame import Rect, Surface
 
@@ -7,50 +9,165 @@ from items import Dynamic
 
 
 class CharacterView:
+    """
+    Ego-centric view of a character: the region of the game area in front
+    of it, rotated so that the character faces up.
+
+    Rather than rotating a crop of the game area, for each output pixel
+    the source pixel is looked up: the lookup is computed once for each
+    (quantized) rotation angle, and reused while the character does not
+    rotate.
+    """
+
+    # rotation angles are quantized to this step (in degrees)
+    ANGLE_STEP = 0.5
+
     def __init__(self, window_width: int, window_height: int) -> None:
         self.__window_width = window_width
         self.__window_height = window_height
         # self.__screen = Surface((window_width, window_height))
 
-    def get_view(self, target_surface: Surface, character: Dynamic) -> Surface:
-        s = max(self.__window_width, self.__window_height)
-        r = s / math.cos(math.pi / 4)
-        ch_rect = character.rect
-        x = ch_rect.x + ch_rect.width / 2
-        y = ch_rect.y + ch_rect.height / 2
-
-        R1 = Rect(
-            x - r,
-            y - r,
-            2 * r,
-            2 * r
+        self.__lookup_key: Optional[Tuple[float, int, float, float]] = None
+        self.__offsets: Optional[Tuple[np.ndarray, np.ndarray]] = None
+        self.__view: Optional[Surface] = None
+
+    def __get_angle(self, character: Dynamic) -> float:
+        angle = 90 - math.degrees(character.orientation_rad)
+
+        return round(angle / CharacterView.ANGLE_STEP) * CharacterView.ANGLE_STEP
+
+    def __get_window_center(self, theta: float, ch_height: int) -> Tuple[float, float]:
+        """
+        Offset, from the character center, of the center of the window in
+        the game area.
+        """
+        # the window is horizontally centered on the character, with the
+        # character at its bottom
+        e = ch_height - self.__window_height / 2
+
+        return -e * math.sin(theta), e * math.cos(theta)
+
+    def __get_offsets(
+            self,
+            angle: float,
+            ch_height: int,
+            fx: float,
+            fy: float
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Offsets of the source pixels of the view, indexed as [x, y], from
+        the pixel containing the character center. The center lies at fx,
+        fy within that pixel.
+        """
+        key = (angle, ch_height, fx, fy)
+
+        if self.__lookup_key != key:
+            theta = math.radians(angle)
+            cos, sin = math.cos(theta), math.sin(theta)
+
+            # coordinates of the pixel centers in the rotated frame,
+            # relative to the character center
+            dx = np.arange(self.__window_width) + .5 - self.__window_width / 2
+            dy = np.arange(self.__window_height) + .5 - self.__window_height + ch_height
+            dx, dy = np.meshgrid(dx, dy, indexing='ij')
+
+            self.__offsets = (
+                np.floor(dx * cos - dy * sin + fx).astype(np.intp),
+                np.floor(dx * sin + dy * cos + fy).astype(np.intp)
+            )
+            self.__lookup_key = key
+
+        return self.__offsets
+
+    def get_source_rect(self, character: Dynamic, ch_rect: Optional[Rect] = None) -> Rect:
+        """
+        Region of the game area the view of the character is taken from.
+        The character is at `ch_rect` when given (e.g. where it's drawn,
+        between two simulation steps), otherwise at its rect.
+        """
+        theta = math.radians(self.__get_angle(character))
+
+        if ch_rect is None:
+            ch_rect = character.rect
+
+        ox, oy = self.__get_window_center(theta, ch_rect.height)
+        x = ch_rect.x + ch_rect.width / 2 + ox
+        y = ch_rect.y + ch_rect.height / 2 + oy
+
+        # bounding box of the rotated window
+        w, h = self.__window_width / 2, self.__window_height / 2
+        rx = w * abs(math.cos(theta)) + h * abs(math.sin(theta)) + 1
+        ry = w * abs(math.sin(theta)) + h * abs(math.cos(theta)) + 1
+
+        return Rect(
+            x - rx,
+            y - ry,
+            2 * rx + 1,
+            2 * ry + 1
+        )
+
+    def get_view(
+            self,
+            target_surface: Surface,
+            character: Dynamic,
+            ch_rect: Optional[Rect] = None
+    ) -> Surface:
+        """
+        Returns the view of the character, at `ch_rect` if given as for
+        `get_source_rect`, in the coordinates of the target surface. The
+        same surface is reused (and overwritten) by the following calls.
+        """
+        if ch_rect is None:
+            ch_rect = character.rect
+
+        cx = ch_rect.x + ch_rect.width / 2
+        cy = ch_rect.y + ch_rect.height / 2
+        x, y = math.floor(cx), math.floor(cy)
+
+        ox, oy = self.__get_offsets(
+            self.__get_angle(character),
+            ch_rect.height,
+            cx - x,
+            cy - y
         )
 
-        alpha = math.degrees(character.orientation_rad)
+        xs = ox + x
+        ys = oy + y
 
-        target_rect = target_surface.get_rect()
+        width, height = target_surface.get_size()
+        inside = (xs >= 0) & (xs < width) & (ys >= 0) & (ys < height)
 
-        crop = target_surface.subsurface(R1.clip(target_rect)).copy()
-        # crop.set_alpha(100)
+        if self.__view is None:
+            self.__view = Surface(
+                (self.__window_width, self.__window_height),
+                0,
+                target_surface
+            )
 
-        view = Surface((R1.width, R1.height))
-        img_x = 0 if R1.left > 0 else -R1.left
-        img_y = 0 if R1.top > 0 else -R1.top
+        # with 32 bits pixels, they are copied as they are
+        if target_surface.get_bytesize() == 4:
+            pixels = pg.surfarray.pixels2d(target_surface)
+        else:
+            pixels = pg.surfarray.pixels3d(target_surface)
 
-        view.blit(crop, (img_x, img_y))
+        view_pixels = pixels[np.clip(xs, 0, width - 1), np.clip(ys, 0, height - 1)]
+        del pixels
 
-        view = pg.transform.rotate(view, 90 - alpha)
+        # the view is black outside of the game area
+        view_pixels[~inside] = 0
 
-        R1 = view.get_rect()
+        pg.surfarray.blit_array(self.__view, view_pixels)
 
-        R2 = Rect(
-            (R1.width - self.__window_width) / 2,
-            R1.height / 2 - self.__window_height + ch_rect.height,
-            self.__window_width,
-            self.__window_height
-        )
+        return self.__view
+
+    @property
+    def source_size(self) -> Tuple[int, int]:
+        """
+        Size enclosing the source rects at any angle, when centered on them.
+        """
+        side = math.ceil(math.hypot(self.__window_width, self.__window_height)) + 4
 
-        return view.subsurface(R2).copy()
+        return side, side
 
     @property
     def screen(self) -> Surface:
@@ -0,0 +1,133 @@
+import math
+from typing import Sequence
+
+import numpy as np
+from pygame import Rect
+
+from items import Dynamic
+from util import Grid, ItemType, WallLayer
+
+# Channels of the observations: one for each item type, telling whether
+# the cell is occupied by items of that type, then the value of the
+# consumables in the cell (negative for malus) and the score of the
+# characters and monsters in it.
+VALUE_CHANNEL = len(ItemType)
+SCORE_CHANNEL = len(ItemType) + 1
+CHANNELS = len(ItemType) + 2
+
+
+class GridObserver:
+    """
+    Semantic, ego-centric observations of the world, computed from the
+    grid with no rendering at all.
+
+    Each observation is a (channels, view_height, view_width) array of
+    cells, aligned to the orientation of the observing agent: the agent is
+    in the middle of the bottom row, facing up (towards row 0). Cells
+    outside of the map are seen as walls.
+    """
+
+    def __init__(self, grid: Grid, view_width: int, view_height: int) -> None:
+        self.__grid = grid
+        self.__view_width = view_width
+        self.__view_height = view_height
+
+        # lateral and forward distance (in cells) of each observed cell
+        rows, cols = np.mgrid[0:view_height, 0:view_width]
+        self.__lateral = (cols - (view_width - 1) / 2).astype(np.float32)
+        self.__forward = (view_height - 1 - rows).astype(np.float32)
+
+        # half side of the square of cells around an agent covering its
+        # view, whatever the orientation
+        self.__radius = math.ceil(math.hypot(view_width / 2 + 1, view_height + 1))
+
+    def __fill_local(self, local: np.ndarray, agent: Dynamic, x0: int, y0: int):
+        """
+        Fills the local map (channels, x, y) of the cells around the agent,
+        whose origin is the cell x0, y0.
+        """
+        cw, ch = self.__grid.cell_size
+        side = local.shape[1]
+
+        walls = self.__grid.walls.region(
+            x0, y0, x0 + side - 1, y0 + side - 1,
+            fill=WallLayer.FULL
+        )
+        local[ItemType.wall.value] = walls == WallLayer.FULL
+
+        area = Rect(x0 * cw, y0 * ch, side * cw, side * ch).clip(
+            Rect((0, 0), self.__grid.area)
+        )
+        items = self.__grid.iter_items_in_area(area, exclude_id=agent.id)
+
+        for item in items:
+            rect = item.rect
+
+            i0 = max(rect.left // cw - x0, 0)
+            j0 = max(rect.top // ch - y0, 0)
+            i1 = min((rect.right - 1) // cw - x0, side - 1)
+            j1 = min((rect.bottom - 1) // ch - y0, side - 1)
+
+            if i0 > i1 or j0 > j1:
+                continue
+
+            cells = (slice(i0, i1 + 1), slice(j0, j1 + 1))
+            status = item.item_status
+
+            local[(item.item_type.value,) + cells] = 1
+
+            if item.item_type is ItemType.bonus:
+                local[(VALUE_CHANNEL,) + cells] += status.value
+            elif item.item_type is ItemType.malus:
+                local[(VALUE_CHANNEL,) + cells] -= status.value
+
+            # zero for the items with no score
+            local[(SCORE_CHANNEL,) + cells] += status.score
+
+    def observe(self, agents: Sequence[Dynamic]) -> np.ndarray:
+        """
+        Returns the observations of all the agents, as an array of shape
+        (agents, channels, view_height, view_width).
+        """
+        n = len(agents)
+        cw, ch = self.__grid.cell_size
+        side = 2 * self.__radius + 1
+
+        local = np.zeros((n, CHANNELS, side, side), dtype=np.float32)
+
+        centers = np.empty((n, 2), dtype=np.float32)
+        alphas = np.empty(n, dtype=np.float32)
+        origins = np.empty((n, 2), dtype=np.intp)
+
+        for k, agent in enumerate(agents):
+            rect = agent.rect
+            cx = rect.x + rect.width / 2
+            cy = rect.y + rect.height / 2
+
+            x0 = int(cx // cw) - self.__radius
+            y0 = int(cy // ch) - self.__radius
+
+            self.__fill_local(local[k], agent, x0, y0)
+
+            centers[k] = cx, cy
+            alphas[k] = agent.orientation_rad
+            origins[k] = x0, y0
+
+        # positions of the observed cells, for all the agents at once: the
+        # forward direction is (cos, -sin), the right one is (sin, cos)
+        cos = np.cos(alphas)[:, None, None]
+        sin = np.sin(alphas)[:, None, None]
+
+        lateral = self.__lateral[None] * cw
+        forward = self.__forward[None] * ch
+
+        xs = centers[:, 0, None, None] + lateral * sin + forward * cos
+        ys = centers[:, 1, None, None] + lateral * cos - forward * sin
+
+        ix = np.floor(xs / cw).astype(np.intp) - origins[:, 0, None, None]
+        iy = np.floor(ys / ch).astype(np.intp) - origins[:, 1, None, None]
+
+        agent_idx = np.arange(n)[:, None, None]
+
+        # (agents, height, width, channels) -> (agents, channels, height, width)
+        return local[agent_idx, :, ix, iy].transpose(0, 3, 1, 2)
@@ -0,0 +1,271 @@
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pygame import Rect, Surface
+
+from items.factory import Provider
+from util import Item, ItemType
+
+BLACK = (0, 0, 0)
+
+# side of the square chunks the background is rendered in
+BACKGROUND_CHUNK_SIZE = 256
+
+# chunks of the background kept rendered, the least recently used ones
+# being dropped first
+MAX_BACKGROUND_CHUNKS = 64
+
+# types of the items drawn on each frame, in drawing order: walls are part
+# of the background
+DRAWN_TYPES = (
+    ItemType.bonus,
+    ItemType.malus,
+    ItemType.character,
+    ItemType.monster
+)
+
+
+def subtract(rect: Rect, others: Iterable[Rect]) -> List[Rect]:
+    """
+    Returns rects covering the part of `rect` not covered by `others`.
+    """
+    parts = [rect]
+
+    for other in others:
+        remaining = []
+
+        for part in parts:
+            clipped = part.clip(other)
+
+            if clipped.width == 0 or clipped.height == 0:
+                remaining.append(part)
+                continue
+
+            # strips above and below the overlap, then at its sides
+            if clipped.top > part.top:
+                remaining.append(Rect(part.left, part.top, part.width, clipped.top - part.top))
+
+            if clipped.bottom < part.bottom:
+                remaining.append(Rect(part.left, clipped.bottom, part.width, part.bottom - clipped.bottom))
+
+            if clipped.left > part.left:
+                remaining.append(Rect(part.left, clipped.top, clipped.left - part.left, clipped.height))
+
+            if clipped.right < part.right:
+                remaining.append(Rect(clipped.right, clipped.top, part.right - clipped.right, clipped.height))
+
+        parts = remaining
+
+    return parts
+
+
+def interpolate_rect(previous: Rect, current: Rect, alpha: float) -> Rect:
+    """
+    Returns the rect at the fraction `alpha` of the way from `previous` to
+    `current`.
+    """
+    if previous == current:
+        return current
+
+    return Rect(
+        round(previous.x + (current.x - previous.x) * alpha),
+        round(previous.y + (current.y - previous.y) * alpha),
+        current.width,
+        current.height
+    )
+
+
+class Background:
+    """
+    Walls and static items, which never change: they are rendered in
+    chunks as they first get visible, and only the chunks used last are
+    kept.
+    """
+
+    def __init__(self, provider: Provider, max_chunks: int = MAX_BACKGROUND_CHUNKS) -> None:
+        self.__provider = provider
+        self.__grid = provider.grid
+        self.__area = provider.area
+        self.__max_chunks = max_chunks
+
+        self.__chunks: OrderedDict[Tuple[int, int], Surface] = OrderedDict()
+
+    def __get_chunk(self, ci: int, cj: int) -> Surface:
+        chunk = self.__chunks.get((ci, cj))
+
+        if chunk is not None:
+            self.__chunks.move_to_end((ci, cj))
+            return chunk
+
+        area = Rect(
+            ci * BACKGROUND_CHUNK_SIZE,
+            cj * BACKGROUND_CHUNK_SIZE,
+            BACKGROUND_CHUNK_SIZE,
+            BACKGROUND_CHUNK_SIZE
+        )
+
+        chunk = self.__chunks[(ci, cj)] = Surface(area.size)
+        chunk.fill(BLACK)
+
+        self.__provider.draw_walls(chunk, area)
+
+        walls = self.__grid.iter_items_in_area(area.clip(self.__area), ItemType.wall)
+
+        for item in walls:
+            chunk.blit(item.image, item.rect.move(-area.x, -area.y))
+
+        if len(self.__chunks) > self.__max_chunks:
+            self.__chunks.popitem(last=False)
+
+        return chunk
+
+    def restore(self, target: Surface, rect: Rect, origin: Tuple[int, int]):
+        """
+        Draws the background of `rect` on the target, whose origin is at
+        `origin` in the game area. Outside of the game area it's black.
+        """
+        target.fill(BLACK, rect.move(-origin[0], -origin[1]))
+
+        rect = rect.clip(self.__area)
+
+        if rect.width == 0 or rect.height == 0:
+            return
+
+        for ci in range(rect.left // BACKGROUND_CHUNK_SIZE, (rect.right - 1) // BACKGROUND_CHUNK_SIZE + 1):
+            for cj in range(rect.top // BACKGROUND_CHUNK_SIZE, (rect.bottom - 1) // BACKGROUND_CHUNK_SIZE + 1):
+                chunk_rect = Rect(
+                    ci * BACKGROUND_CHUNK_SIZE,
+                    cj * BACKGROUND_CHUNK_SIZE,
+                    BACKGROUND_CHUNK_SIZE,
+                    BACKGROUND_CHUNK_SIZE
+                )
+                part = rect.clip(chunk_rect)
+
+                target.blit(
+                    self.__get_chunk(ci, cj),
+                    part.move(-origin[0], -origin[1]),
+                    area=part.move(-chunk_rect.x, -chunk_rect.y)
+                )
+
+
+class Renderer:
+    """
+    Draws the items in a window of the game area, on a surface of the size
+    of the window: the game area as a whole is never drawn, so the memory
+    used does not depend on the size of the map.
+
+    When the window moves, what's still inside is scrolled and only the
+    parts which just got visible are drawn entirely. Then, on each frame,
+    only the parts where items moved, changed image or disappeared are
+    restored from the background and redrawn. The items are found by
+    querying the grid, so the cost does not depend on the size of the map
+    either.
+
+    Items moved by the last simulation step can be drawn in between their
+    previous and current rects, so that motion looks smooth when frames
+    are not aligned with the steps.
+    """
+
+    def __init__(
+            self,
+            provider: Provider,
+            size: Tuple[int, int],
+            background: Optional[Background] = None
+    ) -> None:
+        self.__grid = provider.grid
+        self.__area = provider.area
+        self.__background = background if background is not None else Background(provider)
+
+        self.__surface = Surface(size)
+
+        # region of the game area drawn on the surface
+        self.__rect: Optional[Rect] = None
+
+        # rect and image each item was last drawn with
+        self.__drawn: Dict[Item, Tuple[Rect, Surface]] = {}
+
+    def draw(
+            self,
+            origin: Tuple[int, int],
+            previous_rects: Optional[Dict[Item, Rect]] = None,
+            alpha: float = 1
+    ) -> List[Rect]:
+        """
+        Draws the window at `origin` in the game area, returning the parts
+        of the surface which changed. Items in `previous_rects` are drawn at
+        the fraction `alpha` of the way from the rect there to the current
+        one.
+        """
+        region = Rect(origin, self.__surface.get_size())
+        shown = self.__rect
+
+        # parts of the window which were not shown are drawn entirely
+        if shown is None:
+            dirty = [region]
+        else:
+            if shown.topleft != region.topleft:
+                self.__surface.scroll(shown.x - region.x, shown.y - region.y)
+
+            dirty = subtract(region, [shown])
+
+        self.__rect = region
+
+        current: Dict[Item, Tuple[Rect, Surface]] = {}
+
+        # the window may extend past the game area, the grid may not
+        queried = region.clip(self.__area)
+
+        for item_type in DRAWN_TYPES if queried.width and queried.height else ():
+            for item in self.__grid.iter_items_in_area(queried, item_type):
+                rect = item.rect
+
+                if previous_rects is not None and item in previous_rects:
+                    rect = interpolate_rect(previous_rects[item], rect, alpha)
+
+                current[item] = (rect, item.image)
+
+        for item, (rect, image) in self.__drawn.items():
+            state = current.get(item)
+
+            if state is None:
+                dirty.append(rect)
+            elif state[0] != rect or state[1] is not image:
+                dirty.append(rect)
+                dirty.append(state[0])
+
+        for item, (rect, _) in current.items():
+            if item not in self.__drawn:
+                dirty.append(rect)
+
+        self.__drawn = current
+
+        dirty = [r for r in (rect.clip(region) for rect in dirty) if r.width and r.height]
+
+        if not dirty:
+            return dirty
+
+        for rect in dirty:
+            self.__background.restore(self.__surface, rect, origin)
+
+        # items overlapping the restored parts are drawn again, not only
+        # the changed ones
+        self.__surface.blits(
+            [
+                (image, rect.move(-region.x, -region.y))
+                for rect, image in current.values() if rect.collidelist(dirty) != -1
+            ],
+            doreturn=False
+        )
+
+        return [rect.move(-region.x, -region.y) for rect in dirty]
+
+    @property
+    def surface(self) -> Surface:
+        return self.__surface
+
+    @property
+    def rect(self) -> Optional[Rect]:
+        """
+        Region of the game area last drawn.
+        """
+        return self.__rect